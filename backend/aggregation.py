@@ -0,0 +1,326 @@
+"""Rank aggregation over stage-2 rankings, vectorized with NumPy.
+
+A ballot is one judge's ranking: a list from best to worst whose items are
+candidates, tie groups (lists of candidates ranked equal) or Merged groups
+(candidates sharing one position, e.g. models whose near-duplicate answers
+were reviewed once). Ballots may be partial; candidates a ballot leaves out
+are not compared by it. All methods work from the pairwise preference
+counts, so thousands of ballots (a whole conversation history) reduce to one
+n x n matrix before any scoring.
+"""
+
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class Merged(tuple):
+    """
+    Candidates that take one position on a ballot together.
+
+    Unlike a tie group, the members occupy a single place (a merged group
+    ranked first puts every member at 1, not 1.5), and they are not
+    compared with each other: the judge saw one answer, not several.
+    """
+
+
+Ballot = Sequence[Union[str, Sequence[str]]]
+
+# Ballots compared per step in pairwise_counts (bounds the B x n x n temporary)
+BALLOT_CHUNK = 1024
+
+
+def ballot_candidates(ballots: Sequence[Ballot]) -> List[str]:
+    """Every candidate named in the ballots, in order of first appearance."""
+    seen: Dict[str, None] = {}
+    for ballot in ballots:
+        for item in ballot:
+            for candidate in ([item] if isinstance(item, str) else item):
+                seen.setdefault(candidate, None)
+    return list(seen)
+
+
+def rank_matrix(ballots: Sequence[Ballot], candidates: Sequence[str]) -> np.ndarray:
+    """
+    Positions of every candidate on every ballot.
+
+    Tied candidates share the mean of the positions they span (a tie for
+    2nd between two candidates puts both at 2.5); Merged members share the
+    single position of their group. Candidates a ballot does not rank, or
+    that are not in `candidates`, are NaN.
+
+    Args:
+        ballots: Rankings, best first
+        candidates: Column order of the result
+
+    Returns:
+        Float array of shape (len(ballots), len(candidates)), 1 = best
+    """
+    return _positions(ballots, candidates)[0]
+
+
+def _positions(ballots: Sequence[Ballot], candidates: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """rank_matrix plus, per cell, the id of the Merged group it belongs to (NaN if none)."""
+    column = {candidate: i for i, candidate in enumerate(candidates)}
+    rows, columns, values, groups = [], [], [], []
+    group_id = 0
+    for row, ballot in enumerate(ballots):
+        position = 1
+        seen = set()
+        for item in ballot:
+            group = [column[c] for c in ([item] if isinstance(item, str) else item) if c in column]
+            group = [i for i in dict.fromkeys(group) if i not in seen]
+            if not group:
+                continue
+            seen.update(group)
+            rows.extend([row] * len(group))
+            columns.extend(group)
+            if isinstance(item, Merged):
+                values.extend([position] * len(group))
+                groups.extend([group_id] * len(group))
+                group_id += 1
+                position += 1
+            else:
+                values.extend([position + (len(group) - 1) / 2] * len(group))
+                groups.extend([np.nan] * len(group))
+                position += len(group)
+
+    ranks = np.full((len(ballots), len(candidates)), np.nan)
+    ranks[rows, columns] = values
+    merged = np.full(ranks.shape, np.nan)
+    merged[rows, columns] = groups
+    return ranks, merged
+
+
+def pairwise_counts(
+    ranks: np.ndarray,
+    chunk: int = BALLOT_CHUNK,
+    merged: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pairwise preference counts from a rank matrix.
+
+    Args:
+        ranks: Output of rank_matrix
+        chunk: Ballots compared per step
+        merged: Merged group ids from _positions; pairs within one group
+            are not counted as ties
+
+    Returns:
+        Tuple of (wins, ties): wins[i, j] is the number of ballots ranking i
+        above j, ties[i, j] the number ranking both equal
+    """
+    n = ranks.shape[1]
+    wins = np.zeros((n, n))
+    ties = np.zeros((n, n))
+    for start in range(0, len(ranks), chunk):
+        block = ranks[start:start + chunk]
+        left, right = block[:, :, None], block[:, None, :]
+        wins += (left < right).sum(axis=0)  # NaN compares False: unranked pairs count for nothing
+        tied = left == right
+        if merged is not None:
+            groups = merged[start:start + chunk]
+            tied &= groups[:, :, None] != groups[:, None, :]  # NaN != NaN: ordinary ties still count
+        ties += tied.sum(axis=0)
+    np.fill_diagonal(ties, 0)
+    return wins, ties
+
+
+def opponent_weights(
+    ranks: np.ndarray,
+    merged: np.ndarray,
+    chunk: int = BALLOT_CHUNK
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    How much each comparison counts when ballots have Merged groups.
+
+    A Merged group is one answer, so beating it counts once however many
+    members it has, and a game against it is one game shared by its
+    members. Members of a group are not opponents of each other.
+
+    Args:
+        ranks: Positions from _positions
+        merged: Merged group ids from _positions
+
+    Returns:
+        Tuple of (opponents, games), n x n, averaged over the ballots
+        comparing each pair: opponents[i, j] = 1 / size of j's group (for
+        the opponent-counting methods), games[i, j] = 1 / (size of i's
+        group * size of j's group) (symmetric, for Bradley-Terry). Pairs
+        only ever seen inside one group get 0, uncompared pairs 1.
+    """
+    n = ranks.shape[1]
+    opponents = np.zeros((n, n))
+    games = np.zeros((n, n))
+    compared_count = np.zeros((n, n))
+    together = np.zeros((n, n))
+    for start in range(0, len(ranks), chunk):
+        ranked = ~np.isnan(ranks[start:start + chunk])
+        groups = merged[start:start + chunk]
+        same = groups[:, :, None] == groups[:, None, :]  # NaN == NaN is False
+        share = 1.0 / np.maximum(same.sum(axis=2), 1)
+        compared = ranked[:, :, None] & ranked[:, None, :] & ~same
+        opponents += (compared * share[:, None, :]).sum(axis=0)
+        games += (compared * share[:, :, None] * share[:, None, :]).sum(axis=0)
+        compared_count += compared.sum(axis=0)
+        together += same.sum(axis=0)
+
+    def mean(totals):
+        unseen = np.where(together > 0, 0.0, 1.0)
+        weights = np.divide(totals, compared_count, out=unseen, where=compared_count > 0)
+        np.fill_diagonal(weights, 0)
+        return weights
+
+    return mean(opponents), mean(games)
+
+
+def borda_scores(wins: np.ndarray, ties: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Borda count: candidates beaten on each ballot, ties counting half (see opponent_weights)."""
+    points = wins + 0.5 * ties
+    return (points if weights is None else points * weights).sum(axis=1)
+
+
+def copeland_scores(wins: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Copeland score: head-to-head majorities won, drawn majorities counting half."""
+    compared = (wins + wins.T) > 0
+    outcomes = (wins > wins.T) + 0.5 * ((wins == wins.T) & compared)
+    return (outcomes if weights is None else outcomes * weights).sum(axis=1)
+
+
+def schulze_scores(wins: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Schulze method: number of opponents each candidate beats by strongest path.
+
+    The strongest paths are found with a vectorized Floyd-Warshall (widest
+    path), O(n^3) in the number of candidates and independent of the ballots.
+    """
+    n = len(wins)
+    strength = np.where(wins > wins.T, wins, 0.0)
+    for k in range(n):
+        via = np.minimum(strength[:, k:k + 1], strength[k:k + 1, :])
+        np.maximum(strength, via, out=strength)
+    np.fill_diagonal(strength, 0)
+    beaten = (strength > strength.T).astype(float)
+    return (beaten if weights is None else beaten * weights).sum(axis=1)
+
+
+def bradley_terry(
+    wins: np.ndarray,
+    ties: np.ndarray,
+    prior: float = 0.5,
+    max_iter: int = 1000,
+    tol: float = 1e-9
+) -> np.ndarray:
+    """
+    Bradley-Terry strengths fitted with Hunter's MM algorithm.
+
+    A tie counts as half a win each way. `prior` adds that many virtual
+    ties between every pair, which keeps strengths finite for candidates
+    that never win (or never lose) and connects candidates that were never
+    compared.
+
+    Args:
+        wins: Pairwise win counts
+        ties: Pairwise tie counts
+        prior: Virtual ties per pair
+        max_iter: Iteration limit
+        tol: Stop when no strength changes by more than this
+
+    Returns:
+        Strengths summing to 1; P(i beats j) = s_i / (s_i + s_j)
+    """
+    n = len(wins)
+    if n <= 1:
+        return np.ones(n) / max(n, 1)
+    off_diagonal = 1.0 - np.eye(n)
+    scored = wins + 0.5 * ties + prior * 0.5 * off_diagonal
+    games = scored + scored.T
+    total_wins = scored.sum(axis=1)
+    strength = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        denominator = (games / (strength[:, None] + strength[None, :])).sum(axis=1)
+        updated = np.divide(total_wins, denominator, out=np.zeros(n), where=denominator > 0)
+        updated /= updated.sum() or 1.0
+        converged = np.abs(updated - strength).max() < tol
+        strength = updated
+        if converged:
+            break
+    return strength
+
+
+def aggregate(
+    ballots: Sequence[Ballot],
+    candidates: Optional[Sequence[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Score candidates with every method at once.
+
+    Args:
+        ballots: Rankings, best first (partial and tied allowed)
+        candidates: Candidates to score (all named in the ballots if None)
+
+    Returns:
+        One dict per candidate with 'model', 'average_rank' (mean position
+        over the ballots ranking it, None if none did), 'rankings_count',
+        'borda', 'copeland', 'schulze' and 'bradley_terry', sorted by
+        Bradley-Terry strength (best first)
+    """
+    if candidates is None:
+        candidates = ballot_candidates(ballots)
+    candidates = list(candidates)
+    if not candidates:
+        return []
+
+    ranks, merged = _positions(ballots, candidates)
+    wins, ties = pairwise_counts(ranks, merged=merged)
+    weights = games = None
+    if not np.isnan(merged).all():
+        weights, games = opponent_weights(ranks, merged)
+    counts = (~np.isnan(ranks)).sum(axis=0)
+    sums = np.nansum(ranks, axis=0)
+    average = np.divide(sums, counts, out=np.full(len(candidates), np.nan), where=counts > 0)
+    scores = {
+        "borda": borda_scores(wins, ties, weights),
+        "copeland": copeland_scores(wins, weights),
+        "schulze": schulze_scores(wins, weights),
+        "bradley_terry": bradley_terry(wins, ties) if games is None else bradley_terry(wins * games, ties * games),
+    }
+
+    results = []
+    for i, candidate in enumerate(candidates):
+        entry = {
+            "model": candidate,
+            "average_rank": None if np.isnan(average[i]) else round(float(average[i]), 2),
+            "rankings_count": int(counts[i]),
+        }
+        entry.update({name: round(float(values[i]), 4) for name, values in scores.items()})
+        results.append(entry)
+    results.sort(key=lambda entry: -entry["bradley_terry"])
+    return results
+
+
+def stage2_ballots(
+    stage2_results: Sequence[Dict[str, Any]],
+    label_to_model: Dict[str, Union[str, List[str]]]
+) -> List[Ballot]:
+    """
+    Turn stage-2 results into ballots of model names.
+
+    Args:
+        stage2_results: Stage-2 entries with 'parsed_ranking'
+        label_to_model: Mapping from anonymous labels to model names; a
+            label of merged near-duplicates maps to a list, which becomes
+            a Merged group so every member gets the cluster's position
+
+    Returns:
+        One ballot per judge (labels missing from the mapping are dropped)
+    """
+    ballots = []
+    for result in stage2_results:
+        # Results stored before labels were normalized may say "回答X"
+        labels = (label.replace("回答", "Response ", 1) for label in result.get("parsed_ranking") or [])
+        ballots.append([
+            label_to_model[label] if isinstance(label_to_model[label], str) else Merged(label_to_model[label])
+            for label in labels if label in label_to_model
+        ])
+    return ballots
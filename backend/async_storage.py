@@ -0,0 +1,126 @@
+"""Async facade over backend.storage for use from request handlers.
+
+File work runs in a bounded thread pool so it never blocks the event loop.
+Writes to the same conversation are serialized by a per-conversation
+asyncio lock (so queued writes do not each hold a pool thread while they
+wait), and storage's file locks serialize them against other processes.
+"""
+
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from . import storage
+from .config import STORAGE_IO_WORKERS
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix="storage")
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def conversation_lock(conversation_id: str) -> asyncio.Lock:
+    """
+    The asyncio lock serializing writes to one conversation.
+
+    Locks are dropped once no coroutine holds or waits on them.
+
+    Args:
+        conversation_id: Conversation identifier
+
+    Returns:
+        The conversation's lock
+    """
+    lock = _locks.get(conversation_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[conversation_id] = lock
+    return lock
+
+
+async def _run(func: Callable, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+async def _write(conversation_id: str, func: Callable, *args):
+    async with conversation_lock(conversation_id):
+        return await _run(func, conversation_id, *args)
+
+
+async def create_conversation(conversation_id: str = None) -> Dict[str, Any]:
+    """Create a new conversation (see storage.create_conversation)."""
+    return await _run(storage.create_conversation, conversation_id)
+
+
+async def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Load a conversation, or None if not found."""
+    return await _run(storage.get_conversation, conversation_id)
+
+
+async def get_messages(
+    conversation_id: str,
+    start: int = 0,
+    limit: Optional[int] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """Read a slice of a conversation's messages (see storage.get_messages)."""
+    return await _run(storage.get_messages, conversation_id, start, limit)
+
+
+async def list_conversations_page(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of conversation metadata (see storage.list_conversations_page)."""
+    return await _run(storage.list_conversations_page, limit, cursor, order)
+
+
+async def add_user_message(conversation_id: str, content: str):
+    """Append a user message."""
+    await _write(conversation_id, storage.add_user_message, content)
+
+
+async def add_assistant_message(
+    conversation_id: str,
+    stage1: List[Dict[str, Any]],
+    stage2: List[Dict[str, Any]],
+    stage3: Dict[str, Any]
+):
+    """Append an assistant message with all 3 stages."""
+    await _write(conversation_id, storage.add_assistant_message, stage1, stage2, stage3)
+
+
+async def update_conversation_title(conversation_id: str, title: str):
+    """Change a conversation's title."""
+    await _write(conversation_id, storage.update_conversation_title, title)
+
+
+async def add_message(
+    conversation_id: str,
+    role: str,
+    content: str,
+    stage1: List[Dict] = None,
+    stage2: List[Dict] = None,
+    stage3: Dict = None
+):
+    """Append a message of any role."""
+    await _write(conversation_id, storage.add_message, role, content, stage1, stage2, stage3)
+
+
+async def add_messages(conversation_id: str, messages: List[Dict[str, Any]]):
+    """Append several messages in one write (see storage.add_messages)."""
+    await _write(conversation_id, storage.add_messages, messages)
+
+
+async def fork_conversation(conversation_id: str, title: str = None) -> Optional[Dict[str, Any]]:
+    """Fork a conversation, sharing its history (see storage.fork_conversation)."""
+    return await _run(storage.fork_conversation, conversation_id, None, title)
+
+
+async def delete_conversation(conversation_id: str):
+    """Delete a conversation."""
+    await _write(conversation_id, storage.delete_conversation)
+
+
+def shutdown():
+    """Wait for pending storage work and stop the thread pool."""
+    _executor.shutdown(wait=True)
@@ -0,0 +1,153 @@
+"""Bounded in-process cache of parsed conversations."""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from .config import CONVERSATION_CACHE_MAX_BYTES
+
+
+def _copy(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers may append to the message list or retitle the dict; message
+    # dicts themselves are treated as immutable and shared
+    return {**conversation, "messages": list(conversation["messages"])}
+
+
+class ConversationCache:
+    """
+    LRU cache of parsed conversations, evicting by size.
+
+    Entries are tagged with the stamp (inode, size, mtime) of the log they
+    were read from, so a change by another process is noticed on the next
+    lookup. Storage writes are write-through: the log append happens first
+    and then the cached copy is patched with the same record, so active
+    conversations are never re-parsed and nothing is lost on a crash.
+    Sizes are the serialized log size, a proxy for memory use.
+    """
+
+    def __init__(self, max_bytes: int = CONVERSATION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (conversation, size, stamp)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, conversation_id: str, stamp: tuple) -> Optional[Dict[str, Any]]:
+        """
+        Cached conversation if it was read from the log version `stamp`.
+
+        Args:
+            conversation_id: Conversation identifier
+            stamp: Current stamp of the conversation's log
+
+        Returns:
+            A copy of the conversation, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None or entry[2] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return _copy(entry[0])
+
+    def put(self, conversation_id: str, conversation: Dict[str, Any], size: int, stamp: tuple):
+        """
+        Cache a conversation parsed from the log version `stamp`.
+
+        Args:
+            conversation_id: Conversation identifier
+            conversation: Parsed conversation
+            size: Serialized size in bytes
+            stamp: Stamp of the log it was read from
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(conversation_id)
+            self._entries[conversation_id] = (_copy(conversation), size, stamp)
+            self._bytes += size
+            self._evict()
+
+    def apply(
+        self,
+        conversation_id: str,
+        record: Dict[str, Any],
+        record_size: int,
+        old_stamp: tuple,
+        new_stamp: tuple
+    ):
+        """
+        Patch a cached conversation with a record just appended to its log.
+
+        The entry is dropped instead if it was not current before the append.
+
+        Args:
+            conversation_id: Conversation identifier
+            record: Appended log record
+            record_size: Encoded size of the record
+            old_stamp: Log stamp before the append
+            new_stamp: Log stamp after the append
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            conversation, size, stamp = entry
+            if stamp != old_stamp:
+                self._discard(conversation_id)
+                return
+            if record["type"] == "message":
+                conversation["messages"].append(record["message"])
+            elif record["type"] == "title":
+                conversation["title"] = record["title"]
+            self._entries[conversation_id] = (conversation, size + record_size, new_stamp)
+            self._entries.move_to_end(conversation_id)
+            self._bytes += record_size
+            self._evict()
+
+    def invalidate(self, conversation_id: str):
+        """Drop a conversation (after deletes and whole-log rewrites)."""
+        with self._lock:
+            if self._discard(conversation_id):
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop everything."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _discard(self, conversation_id: str) -> bool:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio and memory use, for sizing CONVERSATION_CACHE_MAX_BYTES."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+conversation_cache = ConversationCache()
@@ -0,0 +1,185 @@
+"""SQLite index of conversation metadata for listing and pagination."""
+
+import base64
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def encode_cursor(sort_key: str, row_id: str) -> str:
+    """
+    Opaque keyset cursor pointing just past a row in listing order.
+
+    Args:
+        sort_key: The row's sort column, as a string (e.g. an ISO timestamp)
+        row_id: The row's id, which breaks ties between equal sort keys
+    """
+    raw = json.dumps([sort_key, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor from encode_cursor().
+
+    Returns:
+        Tuple of (sort_key, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        sort_key, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return str(sort_key), str(row_id)
+
+
+class ConversationIndex:
+    """
+    One row of metadata per conversation, ordered by (created_at, id).
+
+    Storage writes keep the rows current, so listing is an index range scan
+    whose cost depends on the page size rather than the number of
+    conversations or their size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.created = False  # True if the table did not exist yet (needs a rebuild)
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            exists = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations'"
+            ).fetchone()
+            if not exists:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS conversations ("
+                    "id TEXT PRIMARY KEY, created_at TEXT NOT NULL, title TEXT, "
+                    "message_count INTEGER NOT NULL DEFAULT 0)"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS idx_conversations_created ON conversations (created_at, id)")
+                db.commit()
+                self.created = True
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS forks ("
+                "parent_id TEXT NOT NULL, child_id TEXT NOT NULL, messages INTEGER NOT NULL, "
+                "PRIMARY KEY (parent_id, child_id))"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def open(self):
+        """Open (and create if needed) the database."""
+        with self._lock:
+            self._connect()
+
+    def _execute(self, sql: str, params: tuple = (), *more: Tuple[str, tuple]):
+        with self._lock:
+            db = self._connect()
+            db.execute(sql, params)
+            for statement in more:
+                db.execute(*statement)
+            db.commit()
+
+    def upsert(self, conversation_id: str, created_at: str, title: str, message_count: int):
+        """Insert or fully replace a conversation's row."""
+        self._execute(
+            "INSERT OR REPLACE INTO conversations (id, created_at, title, message_count) VALUES (?, ?, ?, ?)",
+            (conversation_id, created_at, title, message_count),
+        )
+
+    def add_messages(self, conversation_id: str, count: int = 1):
+        """Bump a conversation's message count."""
+        self._execute(
+            "UPDATE conversations SET message_count = message_count + ? WHERE id = ?",
+            (count, conversation_id),
+        )
+
+    def set_title(self, conversation_id: str, title: str):
+        """Change a conversation's title."""
+        self._execute("UPDATE conversations SET title = ? WHERE id = ?", (title, conversation_id))
+
+    def delete(self, conversation_id: str):
+        """Remove a conversation's row and its fork links."""
+        self._execute(
+            "DELETE FROM conversations WHERE id = ?", (conversation_id,),
+            ("DELETE FROM forks WHERE parent_id = ? OR child_id = ?", (conversation_id, conversation_id)),
+        )
+
+    def add_fork(self, parent_id: str, child_id: str, messages: int):
+        """Record that `child_id` shares the first `messages` messages of `parent_id`."""
+        self._execute(
+            "INSERT OR REPLACE INTO forks (parent_id, child_id, messages) VALUES (?, ?, ?)",
+            (parent_id, child_id, messages),
+        )
+
+    def forks(self, parent_id: str) -> List[Tuple[str, int]]:
+        """(child id, shared message count) of every fork of a conversation."""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT child_id, messages FROM forks WHERE parent_id = ?", (parent_id,)
+            ).fetchall()
+
+    def page(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        order: str = "desc"
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of conversation metadata using keyset pagination.
+
+        Args:
+            limit: Page size (all remaining conversations if None)
+            cursor: Cursor from the previous page, or None for the first page
+            order: "desc" (newest first) or "asc" by creation time
+
+        Returns:
+            Tuple of (metadata dicts, cursor of the next page or None)
+
+        Raises:
+            ValueError: On an unknown order or malformed cursor
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid order: {order!r}")
+        comparison, direction = (">", "ASC") if order == "asc" else ("<", "DESC")
+
+        sql = "SELECT id, created_at, title, message_count FROM conversations"
+        params: list = []
+        if cursor:
+            sql += f" WHERE (created_at, id) {comparison} (?, ?)"
+            params.extend(decode_cursor(cursor))
+        sql += f" ORDER BY created_at {direction}, id {direction}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)  # one extra row tells whether a next page exists
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return [
+            {"id": row[0], "created_at": row[1], "title": row[2], "message_count": row[3]}
+            for row in rows
+        ], next_cursor
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -1,32 +1,77 @@
 """3-stage LLM Council orchestration."""
 
-from typing import List, Dict, Any, Tuple
-from .openrouter import query_models_parallel, query_model
-from .config import COUNCIL_MODELS, CHAIRMAN_MODEL
-
-
-async def stage1_collect_responses(user_query: str) -> List[Dict[str, Any]]:
+import json
+import re
+from typing import List, Dict, Any, Tuple, Optional, Callable, Collection
+from .openrouter import query_model
+from .quorum import QuorumPolicy, StageTracker, collect_with_quorum, STAGE1_POLICY, STAGE2_POLICY
+from .council_cache import council_cache
+from .aggregation import aggregate, stage2_ballots
+from .prompts import context_budget, build_ranking_sections, build_chairman_sections, RANKING_MARKERS
+from .similarity import similarity_matrix, leader_clusters
+from .tokens import estimate_tokens
+from .config import (
+    COUNCIL_MODELS, CHAIRMAN_MODEL, SEMANTIC_CACHE_MODE, RANKING_OUTPUT_MODE, STAGE2_JUDGE_SUBSET,
+    CONSENSUS_POLICY, CONSENSUS_THRESHOLD, DEDUPE_ENABLED, DEDUPE_THRESHOLD
+)
+
+
+# Callback receiving progress events (dicts with a 'type' key) during a council run
+EventCallback = Optional[Callable[[Dict[str, Any]], None]]
+
+
+async def stage1_collect_responses(
+    user_query: str,
+    on_event: EventCallback = None,
+    policy: QuorumPolicy = STAGE1_POLICY,
+    tracker: Optional[StageTracker] = None
+) -> List[Dict[str, Any]]:
     """
     Stage 1: Collect individual responses from all council models.
 
     Args:
         user_query: The user's question
+        on_event: If given, responses are streamed as 'stage1_delta' events
+            and each finished answer is reported as 'stage1_model_complete'
+        policy: When to stop waiting for slower members
+        tracker: Receives the quorum outcome; without one, members still
+            running when the quorum is met are cancelled
 
     Returns:
         List of dicts with 'model' and 'response' keys
     """
     messages = [{"role": "user", "content": user_query}]
 
-    # Query all models in parallel
-    responses = await query_models_parallel(COUNCIL_MODELS, messages)
+    on_delta = None
+    if on_event:
+        def on_delta(model: str, text: str):
+            on_event({"type": "stage1_delta", "model": model, "delta": text})
 
-    # Format results
+    def on_response(model: str, response: Dict[str, Any]):
+        if on_event:
+            on_event({
+                "type": "stage1_model_complete",
+                "data": {"model": model, "response": response.get('content') or ''}
+            })
+
+    # Query all models in parallel until the quorum is met, reporting each answer as it lands
+    outcome = await collect_with_quorum(
+        COUNCIL_MODELS, messages, policy, on_delta=on_delta, on_response=on_response
+    )
+    if tracker:
+        tracker.add("stage1", outcome)
+    else:
+        outcome.collect_late()
+    responses = outcome.responses
+
+    # Format results in council order so labels stay stable across runs
     stage1_results = []
-    for model, response in responses.items():
+    for model in COUNCIL_MODELS:
+        response = responses.get(model)
         if response is not None:  # Only include successful responses
             stage1_results.append({
                 "model": model,
-                "response": response.get('content', '')
+                "response": response.get('content') or ''
             })
 
     return stage1_results
@@ -34,34 +79,81 @@ async def stage1_collect_responses(user_query: str) -> List[Dict[str, Any]]:
 
 async def stage2_collect_rankings(
     user_query: str,
-    stage1_results: List[Dict[str, Any]]
-) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    stage1_results: List[Dict[str, Any]],
+    on_event: EventCallback = None,
+    policy: QuorumPolicy = STAGE2_POLICY,
+    tracker: Optional[StageTracker] = None,
+    prompt_stats: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Stage 2: Each model ranks the anonymized responses.
 
+    With STAGE2_JUDGE_SUBSET set below the number of responses, each judge
+    only sees the subset judge_assignments() gives it, so the stage reads
+    O(n*k) response tokens instead of O(n^2). The rankings are then partial,
+    which calculate_aggregate_rankings accounts for.
+
     Args:
         user_query: The original user query
         stage1_results: Results from Stage 1
+        on_event: If given, each ranking is reported as a
+            'stage2_model_complete' event as soon as it arrives
+        policy: When to stop waiting for slower judges
+        tracker: Receives the quorum outcome; without one, judges still
+            running when the quorum is met are cancelled
+        prompt_stats: If given, receives the prompt size report under 'stage2'
+            (summed over judges, with the assignments, in sparse mode)
 
     Returns:
-        Tuple of (rankings list, label_to_model mapping)
+        Tuple of (rankings list, label_to_model mapping); a label covering
+        merged near-duplicates maps to the list of their models
     """
-    # Create anonymized labels for responses (Response A, Response B, etc.)
-    labels = [chr(65 + i) for i in range(len(stage1_results))]  # A, B, C, ...
+    # Near-duplicate responses are reviewed once, under one label
+    groups = response_groups(stage1_results)
+
+    # Create anonymized labels for responses (Response A, ..., Response Z, Response AA, ...)
+    labels = [response_label(i) for i in range(len(groups))]
 
-    # Create mapping from label to model name
+    # Create mapping from label to model name (or names, for merged duplicates)
     label_to_model = {
-        f"Response {label}": result['model']
-        for label, result in zip(labels, stage1_results)
+        f"Response {label}": models[0] if len(models) == 1 else models
+        for label, (_, models) in zip(labels, groups)
     }
 
-    # Build the ranking prompt
-    responses_text = "\n\n".join([
-        f"Response {label}:\n{result['response']}"
-        for label, result in zip(labels, stage1_results)
-    ])
+    assignments = judge_assignments(COUNCIL_MODELS, labels, STAGE2_JUDGE_SUBSET)
 
-    ranking_prompt = f"""你正在评估对以下问题的不同回答：
+    # Build the ranking prompts, shortening responses that would overflow the
+    # smallest judge context window
+    if RANKING_OUTPUT_MODE == "json":
+        # Each judge's schema only admits the labels it was shown
+        json_schemas = {judge: ranking_schema(subset) for judge, subset in assignments.items()}
+
+        def build_prompt(responses_text: str, labels: List[str]) -> str:
+            # Placeholders rather than real labels, so no order is suggested
+            example = json.dumps(
+                {"ranking": ["最好的回答标签", "…", "最差的回答标签"], "rationale": "一两句话说明排名理由"},
+                ensure_ascii=False
+            )
+            return f"""你正在评估对以下问题的不同回答：
+
+问题：{user_query}
+
+以下是不同模型的回答（匿名）：
+
+{responses_text}
+
+你的任务：比较这些回答的准确性、完整性和清晰度，从好到差排序。
+
+只输出一个 JSON 对象，不要输出任何其他内容，格式如下：
+{example}
+
+- "ranking" 从好到差列出全部 {len(labels)} 个回答的标签（仅标签字母，如 "A"），每个标签恰好出现一次
+- "rationale" 不超过两句话"""
+    else:
+        json_schemas = None
+
+        def build_prompt(responses_text: str, labels: List[str]) -> str:
+            return f"""你正在评估对以下问题的不同回答：
 
 问题：{user_query}
 
@@ -92,30 +184,175 @@ async def stage2_collect_rankings(
 
 现在请提供你的评估和排名："""
 
-    messages = [{"role": "user", "content": ranking_prompt}]
+    budget = context_budget(COUNCIL_MODELS) - estimate_tokens(build_prompt("", labels))
+    responses = {label: result['response'] for label, (result, _) in zip(labels, groups)}
+    prompts = {}  # subset -> (messages, report); in dense mode every judge shares one
+    for subset in assignments.values():
+        key = tuple(subset)
+        if key not in prompts:
+            responses_text, report = build_ranking_sections(
+                subset, [responses[label] for label in subset], budget
+            )
+            prompts[key] = ([{"role": "user", "content": build_prompt(responses_text, subset)}], report)
+    messages = {judge: prompts[tuple(subset)][0] for judge, subset in assignments.items()}
+
+    if prompt_stats is not None:
+        if len(prompts) == 1:
+            prompt_stats["stage2"] = next(iter(prompts.values()))[1]
+        else:
+            reports = [prompts[tuple(subset)][1] for subset in assignments.values()]
+            prompt_stats["stage2"] = {
+                "prompt_tokens": sum(report["prompt_tokens"] for report in reports),
+                "tokens_saved": sum(report["tokens_saved"] for report in reports),
+                "judge_subset": len(next(iter(assignments.values()))),
+                "assignments": assignments,
+            }
+
+    rankings = {}
+
+    def on_response(model: str, response: Dict[str, Any]):
+        rankings[model] = format_ranking(
+            model, response, [f"Response {label}" for label in assignments[model]]
+        )
+        if on_event:
+            on_event({
+                "type": "stage2_model_complete",
+                "data": rankings[model],
+                "metadata": {"label_to_model": label_to_model}
+            })
 
-    # Get rankings from all council models in parallel
-    responses = await query_models_parallel(COUNCIL_MODELS, messages)
+    # Get rankings from the council in parallel until the quorum is met
+    outcome = await collect_with_quorum(
+        COUNCIL_MODELS, messages, policy, on_response=on_response, json_schemas=json_schemas
+    )
+    if tracker:
+        tracker.add("stage2", outcome)
+    else:
+        outcome.collect_late()
 
-    # Format results
-    stage2_results = []
-    for model, response in responses.items():
-        if response is not None:
-            full_text = response.get('content', '')
-            parsed = parse_ranking_from_text(full_text)
-            stage2_results.append({
-                "model": model,
-                "ranking": full_text,
-                "parsed_ranking": parsed
-            })
+    # Format results in council order
+    stage2_results = [rankings[model] for model in COUNCIL_MODELS if model in rankings]
 
     return stage2_results, label_to_model
 
 
+def response_label(index: int) -> str:
+    """
+    Anonymous label of the index-th response: A..Z, then AA, AB, ...
+
+    Args:
+        index: Zero-based position of the response
+
+    Returns:
+        Label letters (without the "Response " prefix)
+    """
+    label = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(65 + remainder) + label
+    return label
+
+
+def judge_assignments(judges: List[str], labels: List[str], subset_size: int = 0) -> Dict[str, List[str]]:
+    """
+    Which responses each stage-2 judge ranks.
+
+    Sparse judging uses a cyclic round-robin design: judge j gets the k
+    consecutive labels (wrapping around) starting at position
+    floor(j*n/m) of n responses and m judges. k is raised to at least
+    ceil(n/m) + 1 so the windows cover every response and overlap, which
+    keeps the comparison graph connected and lets a pairwise model
+    (Bradley-Terry) place all responses on one scale.
+
+    The evenly spread starts make reviewer counts as balanced as m*k slots
+    allow: every response is read by floor(m*k/n) or ceil(m*k/n) judges.
+    When n does not divide m*k, some responses get one reviewer fewer
+    (n=7, m=4, k=3 reviews E and G once and the rest twice); which ones
+    depends only on council order, so their aggregate scores rest on
+    fewer comparisons. Pick k with m*k a multiple of n to avoid the skew.
+
+    Args:
+        judges: Judge models, in council order
+        labels: Labels of all responses
+        subset_size: Responses per judge (0, or at least len(labels), for all)
+
+    Returns:
+        Dict of judge -> labels to rank, in label order
+    """
+    n, m = len(labels), len(judges)
+    if not subset_size or subset_size >= n or not m:
+        return {judge: list(labels) for judge in judges}
+    k = min(max(subset_size, 2, -(-n // m) + 1), n)
+    assignments = {}
+    for j, judge in enumerate(judges):
+        start = j * n // m
+        assignments[judge] = sorted(
+            (labels[(start + offset) % n] for offset in range(k)), key=labels.index
+        )
+    return assignments
+
+
+def judge_labels(judge: str, label_to_model: Dict[str, Any]) -> List[str]:
+    """The "Response X" labels judge_assignments gave a judge in a run with these labels."""
+    labels = [label.split(" ", 1)[1] for label in label_to_model]
+    assigned = judge_assignments(COUNCIL_MODELS, labels, STAGE2_JUDGE_SUBSET).get(judge, labels)
+    return [f"Response {label}" for label in assigned]
+
+
+def ranking_schema(labels: List[str]) -> Dict[str, Any]:
+    """JSON schema of a structured stage-2 answer for the given labels."""
+    return {
+        "type": "object",
+        "properties": {
+            "ranking": {"type": "array", "items": {"type": "string", "enum": list(labels)}},
+            "rationale": {"type": "string"},
+        },
+        "required": ["ranking", "rationale"],
+    }
+
+
+def format_ranking(
+    model: str,
+    response: Dict[str, Any],
+    valid_labels: Optional[Collection[str]] = None
+) -> Dict[str, Any]:
+    """
+    Build a stage-2 result entry from a judge's raw response.
+
+    A structured (JSON) answer is rendered as its rationale followed by a
+    "最终排名：" list, so it reads like a written evaluation.
+
+    Args:
+        model: The judge model
+        response: Response dict from query_model
+        valid_labels: "Response X" labels the judge was shown; others are
+            dropped from the parsed ranking
+
+    Returns:
+        Dict with 'model', 'ranking' (evaluation text), 'parsed_ranking'
+        ("Response X" labels) and 'structured'
+    """
+    full_text = response.get('content') or ''
+    parsed, rationale = parse_ranking(full_text, valid_labels)
+    if rationale is not None:
+        lines = [f"{position}. {label}" for position, label in enumerate(parsed, start=1)]
+        full_text = f"{rationale}\n\n{RANKING_MARKERS[0]}\n" + "\n".join(lines)
+    return {
+        "model": model,
+        "ranking": full_text,
+        "parsed_ranking": parsed,
+        "structured": rationale is not None
+    }
+
+
 async def stage3_synthesize_final(
     user_query: str,
     stage1_results: List[Dict[str, Any]],
-    stage2_results: List[Dict[str, Any]]
+    stage2_results: List[Dict[str, Any]],
+    on_event: EventCallback = None,
+    prompt_stats: Optional[Dict[str, Any]] = None,
+    brief: bool = False
 ) -> Dict[str, Any]:
     """
     Stage 3: Chairman synthesizes final response.
@@ -124,22 +361,27 @@ async def stage3_synthesize_final(
         user_query: The original user query
         stage1_results: Individual model responses from Stage 1
         stage2_results: Rankings from Stage 2
+        on_event: If given, the synthesis is streamed and each fragment is
+            reported as a 'stage3_delta' event
+        prompt_stats: If given, receives the prompt size report under 'stage3'
+        brief: Ask for a short merge of agreeing responses instead of a full
+            synthesis (used when stage 2 was skipped on consensus)
 
     Returns:
         Dict with 'model' and 'response' keys
     """
-    # Build comprehensive context for chairman
-    stage1_text = "\n\n".join([
-        f"Model: {result['model']}\nResponse: {result['response']}"
-        for result in stage1_results
-    ])
+    # Build comprehensive context for chairman, condensed to fit its context window
+    def build_prompt(stage1_text: str, stage2_text: str) -> str:
+        if brief:
+            return f"""You are the Chairman of an LLM Council. The council members answered the user's question below and their answers substantially agree, so no peer review was held.
+
+Original Question: {user_query}
 
-    stage2_text = "\n\n".join([
-        f"Model: {result['model']}\nRanking: {result['ranking']}"
-        for result in stage2_results
-    ])
+Council Responses:
+{stage1_text}
 
-    chairman_prompt = f"""You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question, and then ranked each other's responses.
+Merge these into one concise answer: keep what they share, add any correct detail only some of them give, and do not repeat points. Do not mention the council or the individual models."""
+        return f"""You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question, and then ranked each other's responses.
 
 Original Question: {user_query}
 
@@ -147,7 +389,7 @@ STAGE 1 - Individual Responses:
 {stage1_text}
 
 STAGE 2 - Peer Rankings:
-{stage2_text}
+{stage2_text or "(none)"}
 
 Your task as Chairman is to synthesize all of this information into a single, comprehensive, accurate answer to the user's original question. Consider:
 - The individual responses and their insights
@@ -156,65 +398,123 @@ Your task as Chairman is to synthesize all of this information into a single, co
 
 Provide a clear, well-reasoned final answer that represents the council's collective wisdom:"""
 
-    messages = [{"role": "user", "content": chairman_prompt}]
+    budget = context_budget([CHAIRMAN_MODEL]) - estimate_tokens(build_prompt("", ""))
+    distinct = [
+        {"model": ", ".join(models), "response": result['response']}
+        for result, models in response_groups(stage1_results)
+    ]
+    stage1_text, stage2_text, report = build_chairman_sections(distinct, stage2_results, budget)
+    if prompt_stats is not None:
+        prompt_stats["stage3"] = report
+
+    messages = [{"role": "user", "content": build_prompt(stage1_text, stage2_text)}]
 
     # Query the chairman model
-    response = await query_model(CHAIRMAN_MODEL, messages)
+    if on_event:
+        response = await query_model(
+            CHAIRMAN_MODEL,
+            messages,
+            stream=True,
+            on_delta=lambda text: on_event({"type": "stage3_delta", "model": CHAIRMAN_MODEL, "delta": text})
+        )
+    else:
+        response = await query_model(CHAIRMAN_MODEL, messages)
 
     if response is None:
         # Fallback if chairman fails
         return {
             "model": CHAIRMAN_MODEL,
-            "response": "Error: Unable to generate final synthesis."
+            "response": "Error: Unable to generate final synthesis.",
+            "error": True
         }
 
     return {
         "model": CHAIRMAN_MODEL,
-        "response": response.get('content', '')
+        "response": response.get('content') or ''
     }
 
 
+# A response label, optionally as an item of a numbered list ("2. 回答B",
+# "1) Response AA"); group 1 is the list number, group 2 the label letters
+_RANKING_LABEL_RE = re.compile(
+    r"(?:^[ \t]*(\d+)[.)、．][ \t]*)?(?:Response[ \t]*|回答[ \t]*)([A-Z]+)(?![A-Za-z])",
+    re.MULTILINE,
+)
+# A bare label inside a JSON ranking array ("A", "Response A", "回答A")
+_JSON_LABEL_RE = re.compile(r"^(?:Response|回答)?\s*([A-Za-z]+)$")
+
+
+def _json_object(text: str) -> Optional[Dict[str, Any]]:
+    """The JSON object in a (possibly code-fenced) answer, or None."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _unique_labels(letters, valid: Optional[Collection[str]]) -> List[str]:
+    """Canonical "Response X" labels in first-mention order, unknown ones dropped."""
+    ranking = []
+    for letter in letters:
+        label = f"Response {letter}"
+        if label not in ranking and (valid is None or label in valid):
+            ranking.append(label)
+    return ranking
+
+
+def parse_ranking(
+    ranking_text: str,
+    valid_labels: Optional[Collection[str]] = None
+) -> Tuple[List[str], Optional[str]]:
+    """
+    Parse a judge's ranking from a structured JSON answer or free text.
+
+    JSON answers ({"ranking": [...], "rationale": ...}) are read directly.
+    Otherwise the text after the last "最终排名：" / "FINAL RANKING:" marker
+    is scanned once: a numbered list of labels wins over labels merely
+    mentioned. "回答X" and "Response X" are both accepted and returned as
+    "Response X", the form label_to_model uses.
+
+    Args:
+        ranking_text: The full text response from the model
+        valid_labels: If given, labels not in it are dropped
+
+    Returns:
+        Tuple of (labels in ranked order, rationale if the answer was JSON)
+    """
+    data = _json_object(ranking_text) if "{" in ranking_text else None
+    if data is not None and isinstance(data.get("ranking"), list):
+        matches = (_JSON_LABEL_RE.match(str(item).strip()) for item in data["ranking"])
+        letters = [match.group(1).upper() for match in matches if match]
+        rationale = data.get("rationale")
+        return _unique_labels(letters, valid_labels), str(rationale).strip() if rationale else ""
+
+    start = max((ranking_text.rfind(marker) + len(marker) for marker in RANKING_MARKERS if marker in ranking_text),
+                default=0)
+    numbered, mentioned = [], []
+    for match in _RANKING_LABEL_RE.finditer(ranking_text, start):
+        (numbered if match.group(1) else mentioned).append(match.group(2))
+    if not numbered and not mentioned and start:
+        # Marker present but no labels after it: fall back to the whole text
+        mentioned = [match.group(2) for match in _RANKING_LABEL_RE.finditer(ranking_text)]
+    return _unique_labels(numbered or mentioned, valid_labels), None
+
+
 def parse_ranking_from_text(ranking_text: str) -> List[str]:
     """
-    Parse the FINAL RANKING section from the model's response.
-    Supports both English "FINAL RANKING:" and Chinese "最终排名：" formats.
+    Parse the ranking from a judge's response (see parse_ranking).
 
     Args:
         ranking_text: The full text response from the model
 
     Returns:
-        List of response labels in ranked order
+        List of "Response X" labels in ranked order
     """
-    import re
-
-    # Look for ranking section (try Chinese first, then English as fallback)
-    ranking_marker = None
-    if "最终排名：" in ranking_text:
-        ranking_marker = "最终排名："
-    elif "FINAL RANKING:" in ranking_text:
-        ranking_marker = "FINAL RANKING:"
-
-    if ranking_marker:
-        # Extract everything after the ranking marker
-        parts = ranking_text.split(ranking_marker)
-        if len(parts) >= 2:
-            ranking_section = parts[1]
-
-            # Try to extract numbered list format (e.g., "1. Response A" or "1. 回答A")
-            # This pattern looks for: number, period, optional space, "Response X" or "回答X"
-            numbered_matches = re.findall(r'\d+\.\s*(Response [A-Z]|回答[A-Z])', ranking_section)
-            if numbered_matches:
-                # Extract just the "Response X" or "回答X" part
-                return [re.search(r'(Response [A-Z]|回答[A-Z])', m).group() for m in numbered_matches]
-
-            # Fallback: Extract all "Response X" or "回答X" patterns in order
-            matches = re.findall(r'(Response [A-Z]|回答[A-Z])', ranking_section)
-            if matches:
-                return matches
-
-    # Fallback: try to find any "Response X" or "回答X" patterns in order
-    matches = re.findall(r'(Response [A-Z]|回答[A-Z])', ranking_text)
-    return matches
+    return parse_ranking(ranking_text)[0]
 
 
 def calculate_aggregate_rankings(
@@ -229,39 +529,133 @@ def calculate_aggregate_rankings(
         label_to_model: Mapping from anonymous labels to model names
 
     Returns:
-        List of dicts with model name and average rank, sorted best to worst
+        List of dicts with model name, average rank and the Borda, Copeland,
+        Schulze and Bradley-Terry scores (see backend.aggregation), sorted
+        best to worst by Bradley-Terry strength
     """
-    from collections import defaultdict
+    for ranking in stage2_results:
+        # Rankings are parsed once, when the judge's answer arrives
+        if ranking.get('parsed_ranking') is None:
+            ranking['parsed_ranking'] = parse_ranking_from_text(ranking.get('ranking', ''))
 
-    # Track positions for each model
-    model_positions = defaultdict(list)
+    return aggregate(stage2_ballots(stage2_results, label_to_model))
 
-    for ranking in stage2_results:
-        ranking_text = ranking['ranking']
-
-        # Parse the ranking from the structured format
-        parsed_ranking = parse_ranking_from_text(ranking_text)
-
-        for position, label in enumerate(parsed_ranking, start=1):
-            if label in label_to_model:
-                model_name = label_to_model[label]
-                model_positions[model_name].append(position)
-
-    # Calculate average position for each model
-    aggregate = []
-    for model, positions in model_positions.items():
-        if positions:
-            avg_rank = sum(positions) / len(positions)
-            aggregate.append({
-                "model": model,
-                "average_rank": round(avg_rank, 2),
-                "rankings_count": len(positions)
-            })
 
-    # Sort by average rank (lower is better)
-    aggregate.sort(key=lambda x: x['average_rank'])
+def merge_near_duplicates(
+    stage1_results: List[Dict[str, Any]],
+    threshold: float = DEDUPE_THRESHOLD,
+    matrix: Optional[List[List[float]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Mark stage-1 responses that nearly duplicate an earlier one.
+
+    Every response at least `threshold` similar to an earlier cluster
+    leader gets 'duplicate_of' (the leader's model). Stages 2 and 3 then
+    show each cluster once, and the marks are stored with the stage-1
+    results so rankings can be attributed to every member later.
 
-    return aggregate
+    Args:
+        stage1_results: Results from Stage 1
+        threshold: Minimum similarity to merge
+        matrix: Precomputed similarity_matrix of the responses
+
+    Returns:
+        Copies of the results, in the same order
+    """
+    results = [dict(result) for result in stage1_results]
+    if len(results) < 2:
+        return results
+    if matrix is None:
+        matrix = similarity_matrix([result['response'] for result in stage1_results])
+    for cluster in leader_clusters(matrix, threshold):
+        for i in cluster[1:]:
+            results[i]['duplicate_of'] = results[cluster[0]]['model']
+    return results
+
+
+def response_groups(stage1_results: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], List[str]]]:
+    """
+    Distinct stage-1 responses with the models that gave them.
+
+    Args:
+        stage1_results: Stage-1 results, possibly marked by merge_near_duplicates
+
+    Returns:
+        List of (leader result, [leader model, duplicate models...]) in
+        council order
+    """
+    groups: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+    for result in stage1_results:
+        leader = result.get('duplicate_of')
+        if leader in groups:
+            groups[leader][1].append(result['model'])
+        else:
+            groups[result['model']] = (result, [result['model']])
+    return list(groups.values())
+
+
+def history_ballots(messages: List[Dict[str, Any]]) -> List[List[Any]]:
+    """
+    Stage-2 ballots from every assistant message of stored conversations.
+
+    Stored messages do not keep label_to_model, but labels were assigned in
+    stage-1 order to the distinct responses (near-duplicates are marked
+    'duplicate_of'), so the mapping is rebuilt from the stage-1 list.
+
+    Args:
+        messages: Conversation messages (any number of conversations)
+
+    Returns:
+        Ballots of model names for backend.aggregation.aggregate
+    """
+    ballots = []
+    for message in messages:
+        if message.get('role') != 'assistant' or not message.get('stage2'):
+            continue
+        label_to_model = {
+            f"Response {response_label(i)}": models[0] if len(models) == 1 else models
+            for i, (_, models) in enumerate(response_groups(message.get('stage1') or []))
+        }
+        ballots.extend(stage2_ballots(message['stage2'], label_to_model))
+    return ballots
+
+
+def detect_consensus(
+    stage1_results: List[Dict[str, Any]],
+    threshold: float = CONSENSUS_THRESHOLD,
+    matrix: Optional[List[List[float]]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Measure how closely the stage-1 responses agree.
+
+    Agreement is judged on the least similar pair, so one dissenting
+    response is enough to keep the full review.
+
+    Args:
+        stage1_results: Results from Stage 1
+        threshold: Minimum pairwise similarity counted as agreement
+        matrix: Precomputed similarity_matrix of the responses
+
+    Returns:
+        None for fewer than two responses, else a dict with 'agreed',
+        'similarity' (least similar pair), 'mean_similarity' and
+        'representative' (the model whose response is most similar to
+        the others)
+    """
+    if len(stage1_results) < 2:
+        return None
+    if matrix is None:
+        matrix = similarity_matrix([result['response'] for result in stage1_results])
+    n = len(matrix)
+    pairs = [matrix[i][j] for i in range(n) for j in range(i + 1, n)]
+    closeness = [sum(row) - 1.0 for row in matrix]
+    representative = stage1_results[closeness.index(max(closeness))]['model']
+    return {
+        "agreed": min(pairs) >= threshold,
+        "similarity": round(min(pairs), 3),
+        "mean_similarity": round(sum(pairs) / len(pairs), 3),
+        "representative": representative,
+    }
 
 
 async def generate_conversation_title(user_query: str) -> str:
@@ -302,43 +696,153 @@ Title:"""
     return title
 
 
-async def run_full_council(user_query: str) -> Tuple[List, List, Dict, Dict]:
+async def run_full_council(
+    user_query: str,
+    on_event: EventCallback = None
+) -> Tuple[List, List, Dict, Dict]:
     """
     Run the complete 3-stage council process.
 
     Args:
         user_query: The user's question
+        on_event: Optional callback receiving stage start/complete events,
+            per-model stage-1/stage-2 results and streamed stage-1/stage-3
+            deltas, in the order they happen
 
     Returns:
         Tuple of (stage1_results, stage2_results, stage3_result, metadata)
     """
+    def emit(event: Dict[str, Any]):
+        if on_event:
+            on_event(event)
+
+    # Near-duplicate of an earlier question: answer from cache, or offer the
+    # cached answer first while a fresh council runs
+    if SEMANTIC_CACHE_MODE != "off":
+        cached = await council_cache.lookup(user_query)
+        if cached is not None:
+            cached_from = {
+                "query": cached["query"],
+                "similarity": cached["similarity"],
+                "created_at": cached["created_at"],
+            }
+            if SEMANTIC_CACHE_MODE == "return":
+                metadata = {**cached["metadata"], "cached_from": cached_from}
+                emit({"type": "stage1_complete", "data": cached["stage1"]})
+                emit({"type": "stage2_complete", "data": cached["stage2"], "metadata": metadata})
+                emit({"type": "stage3_complete", "data": cached["stage3"]})
+                return cached["stage1"], cached["stage2"], cached["stage3"], metadata
+            emit({"type": "cached_answer", "data": cached["stage3"], "metadata": cached_from})
+
+    tracker = StageTracker()
+    try:
+        stage1_results, stage2_results, stage3_result, metadata = await _run_council_stages(
+            user_query, emit, on_event, tracker
+        )
+    finally:
+        tracker.cancel_all()
+
+    # Only cache runs where every stage succeeded (or was skipped on consensus)
+    reviewed = stage2_results or metadata.get("consensus", {}).get("path", "full") != "full"
+    if SEMANTIC_CACHE_MODE != "off" and reviewed and not stage3_result.get("error"):
+        await council_cache.store(user_query, stage1_results, stage2_results, stage3_result, metadata)
+
+    return stage1_results, stage2_results, stage3_result, metadata
+
+
+async def _run_council_stages(
+    user_query: str,
+    emit: Callable[[Dict[str, Any]], None],
+    on_event: EventCallback,
+    tracker: StageTracker
+) -> Tuple[List, List, Dict, Dict]:
+    """Body of run_full_council; stragglers are left in the tracker."""
     # Stage 1: Collect individual responses
-    stage1_results = await stage1_collect_responses(user_query)
+    emit({"type": "stage1_start"})
+    stage1_results = await stage1_collect_responses(user_query, on_event=on_event, tracker=tracker)
+    emit({"type": "stage1_complete", "data": stage1_results})
 
     # If no models responded successfully, return error
     if not stage1_results:
-        return [], [], {
+        stage3_result = {
             "model": "error",
             "response": "All models failed to respond. Please try again."
-        }, {}
-
-    # Stage 2: Collect rankings
-    stage2_results, label_to_model = await stage2_collect_rankings(user_query, stage1_results)
-
-    # Calculate aggregate rankings
-    aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-
-    # Stage 3: Synthesize final answer
-    stage3_result = await stage3_synthesize_final(
-        user_query,
-        stage1_results,
-        stage2_results
-    )
+        }
+        emit({"type": "stage3_complete", "data": stage3_result})
+        return [], [], stage3_result, {}
+
+    matrix = None
+    if DEDUPE_ENABLED or CONSENSUS_POLICY != "off":
+        matrix = similarity_matrix([result['response'] for result in stage1_results])
+    if DEDUPE_ENABLED:
+        stage1_results = merge_near_duplicates(stage1_results, matrix=matrix)
+
+    # Responses that already agree need no peer review
+    consensus = detect_consensus(stage1_results, matrix=matrix) if CONSENSUS_POLICY != "off" else None
+    path = CONSENSUS_POLICY if consensus and consensus["agreed"] else "full"
+    prompt_stats: Dict[str, Any] = {}
+
+    if path == "full":
+        # Stage 2: Collect rankings
+        emit({"type": "stage2_start"})
+        stage2_results, label_to_model = await stage2_collect_rankings(
+            user_query, stage1_results, on_event=on_event, tracker=tracker, prompt_stats=prompt_stats
+        )
+        # Calculate aggregate rankings
+        aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+    else:
+        stage2_results, aggregate_rankings = [], []
+        label_to_model = {
+            f"Response {response_label(i)}": models[0] if len(models) == 1 else models
+            for i, (_, models) in enumerate(response_groups(stage1_results))
+        }
 
     # Prepare metadata
     metadata = {
         "label_to_model": label_to_model,
-        "aggregate_rankings": aggregate_rankings
+        "aggregate_rankings": aggregate_rankings,
+        "quorum": tracker.summary(),
+        "prompt_budget": prompt_stats
+    }
+    if consensus is not None:
+        metadata["consensus"] = {**consensus, "path": path}
+    emit({"type": "stage2_complete", "data": stage2_results, "metadata": metadata})
+
+    # Stage 3: Synthesize final answer
+    if path == "top":
+        representative = consensus["representative"]
+        stage3_result = {
+            "model": representative,
+            "response": next(r['response'] for r in stage1_results if r['model'] == representative),
+        }
+    else:
+        emit({"type": "stage3_start"})
+        stage3_result = await stage3_synthesize_final(
+            user_query,
+            stage1_results,
+            stage2_results,
+            on_event=on_event,
+            prompt_stats=prompt_stats,
+            brief=path == "merge"
+        )
+    prompt_stats["tokens_saved"] = sum(
+        report["tokens_saved"] for stage, report in prompt_stats.items() if stage in ("stage2", "stage3")
+    )
+    emit({"type": "stage3_complete", "data": stage3_result})
+
+    # Members that missed their stage's quorum but have answered by now
+    late_responses = {
+        "stage1": [
+            {"model": model, "response": response.get('content') or ''}
+            for model, response in tracker.harvest("stage1")
+        ],
+        "stage2": [
+            format_ranking(model, response, judge_labels(model, label_to_model))
+            for model, response in tracker.harvest("stage2")
+        ],
     }
+    if late_responses["stage1"] or late_responses["stage2"]:
+        metadata["late_responses"] = late_responses
+        emit({"type": "late_responses", "data": late_responses})
 
     return stage1_results, stage2_results, stage3_result, metadata
@@ -0,0 +1,237 @@
+"""Near-duplicate question cache for whole council results."""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import (
+    COUNCIL_MODELS,
+    CHAIRMAN_MODEL,
+    SEMANTIC_CACHE_MODE,
+    SEMANTIC_CACHE_MIN_SIMILARITY,
+    SEMANTIC_CACHE_PATH,
+)
+from .similarity import normalize_text, shingles, minhash, signature_similarity, MINHASH_PERMUTATIONS
+
+# LSH banding of the MinHash signature: two questions become candidates when
+# all rows of any band agree. 16 bands x 4 rows puts the 50% candidate point at
+# Jaccard ~0.5, so pairs at the default 0.8 threshold are found >99.9% of the time.
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+# Character 4-grams: bigrams barely see word order ("Is Python faster than
+# Java?" and its reverse share 96% of them), 4-grams span word boundaries
+SHINGLE_SIZE = 4
+
+# Bumped whenever _signature changes, so stored signatures are never compared
+# with differently computed ones
+SIGNATURE_VERSION = 2
+
+# Terms a cached answer must agree on: words, numbers, operators and single
+# CJK characters (Chinese has no word boundaries)
+_TERMS = re.compile(r"[^\W\d_\u3400-\u9fff]+|\d+(?:\.\d+)?|[+\-*/=<>^%]|[\u3400-\u9fff]")
+
+# Function words that may differ between two phrasings of the same question.
+# Deliberately short: negations, question words, modals and prepositions all
+# change what is being asked and are never dropped.
+_FILLER_TERMS = frozenset(
+    "a an the please is are was were be am do does did i me my we our you your it this that "
+    "的 了 吗 呢 吧 啊 呀 请 我 你 您".split()
+)
+
+
+def council_config_key(models: List[str] = None, chairman: str = None) -> str:
+    """Short hash of the council configuration; results only match within one config."""
+    config = json.dumps([models or COUNCIL_MODELS, chairman or CHAIRMAN_MODEL, SIGNATURE_VERSION])
+    return hashlib.sha256(config.encode("utf-8")).hexdigest()[:16]
+
+
+def _signature(user_query: str) -> array:
+    return minhash(shingles(normalize_text(user_query), SHINGLE_SIZE))
+
+
+def _content_terms(user_query: str) -> List[str]:
+    """Content terms of a question in order (filler words dropped)."""
+    return [term for term in _TERMS.findall(normalize_text(user_query)) if term not in _FILLER_TERMS]
+
+
+class CouncilCache:
+    """
+    MinHash LSH index over past questions, persisted in SQLite.
+
+    Signatures are kept in memory as compact arrays and bucketed by band, so a
+    lookup only compares against questions sharing at least one band with the
+    query instead of scanning the whole history.
+
+    Shingle overlap alone cannot tell "sort ascending" from "sort descending"
+    or React from Vue, so a candidate is only a hit when its content terms
+    (every word, number and operator other than a few filler words) match the
+    query's in the same order. Similarity finds candidates; the terms decide.
+    """
+
+    def __init__(
+        self,
+        path: str = SEMANTIC_CACHE_PATH,
+        min_similarity: float = SEMANTIC_CACHE_MIN_SIMILARITY
+    ):
+        self.path = path
+        self.min_similarity = min_similarity
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(LSH_BANDS)]
+        self._signatures: Dict[int, Tuple[array, str]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS council_results ("
+                "id INTEGER PRIMARY KEY, query TEXT, signature BLOB, config TEXT, "
+                "result TEXT, created_at REAL)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _index(self, entry_id: int, signature: array, config: str):
+        self._signatures[entry_id] = (signature, config)
+        for band, buckets in enumerate(self._buckets):
+            buckets[signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()].append(entry_id)
+
+    def _load(self):
+        """Build the in-memory LSH index from the database (once)."""
+        with self._db_lock:
+            if self._loaded:
+                return
+            rows = self._connect().execute("SELECT id, signature, config FROM council_results").fetchall()
+            for entry_id, blob, config in rows:
+                signature = array("I")
+                signature.frombytes(blob)
+                self._index(entry_id, signature, config)
+            self._loaded = True
+
+    def _candidates(self, signature: array, config: str) -> List[Tuple[int, float]]:
+        """Indexed questions similar enough to the signature, most similar first."""
+        matches = {}
+        for band, buckets in enumerate(self._buckets):
+            key = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+            for entry_id in buckets.get(key, ()):
+                if entry_id in matches:
+                    continue
+                candidate, candidate_config = self._signatures[entry_id]
+                matches[entry_id] = (
+                    signature_similarity(signature, candidate) if candidate_config == config else 0.0
+                )
+        return sorted(
+            ((entry_id, similarity) for entry_id, similarity in matches.items()
+             if similarity >= self.min_similarity),
+            key=lambda match: -match[1],
+        )
+
+    def _lookup_sync(self, user_query: str, config: str) -> Optional[Dict[str, Any]]:
+        self._load()
+        signature = _signature(user_query)
+        terms = _content_terms(user_query)
+        with self._db_lock:
+            for entry_id, similarity in self._candidates(signature, config):
+                row = self._connect().execute(
+                    "SELECT query, result, created_at FROM council_results WHERE id = ?", (entry_id,)
+                ).fetchone()
+                if row is None or _content_terms(row[0]) != terms:
+                    continue
+                return {
+                    "query": row[0],
+                    "similarity": round(similarity, 3),
+                    "created_at": row[2],
+                    **json.loads(row[1]),
+                }
+        return None
+
+    def _store_sync(self, user_query: str, config: str, result: Dict[str, Any]):
+        self._load()
+        signature = _signature(user_query)
+        with self._db_lock:
+            db = self._connect()
+            cursor = db.execute(
+                "INSERT INTO council_results (query, signature, config, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_query, signature.tobytes(), config, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            db.commit()
+            self._index(cursor.lastrowid, signature, config)
+
+    async def lookup(self, user_query: str, config: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a prior council result for a near-duplicate question.
+
+        Args:
+            user_query: The user's question
+            config: Council configuration key (current config if None)
+
+        Returns:
+            Dict with 'query', 'similarity', 'created_at', 'stage1', 'stage2',
+            'stage3' and 'metadata', or None if nothing is similar enough
+        """
+        match = await asyncio.to_thread(self._lookup_sync, user_query, config or council_config_key())
+        if match is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return match
+
+    async def store(
+        self,
+        user_query: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any],
+        metadata: Dict[str, Any],
+        config: str = None
+    ):
+        """
+        Remember a completed council result for future near-duplicates.
+
+        Args:
+            user_query: The question that was answered
+            stage1: Stage 1 results
+            stage2: Stage 2 results
+            stage3: Stage 3 result
+            metadata: Run metadata
+            config: Council configuration key (current config if None)
+        """
+        result = {"stage1": stage1, "stage2": stage2, "stage3": stage3, "metadata": metadata}
+        await asyncio.to_thread(self._store_sync, user_query, config or council_config_key(), result)
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and index size."""
+        lookups = self.hits + self.misses
+        return {
+            "mode": SEMANTIC_CACHE_MODE,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "indexed": len(self._signatures),
+            "min_similarity": self.min_similarity,
+        }
+
+
+council_cache = CouncilCache()
@@ -1,23 +1,212 @@
 """数据库服务层，处理所有数据库操作"""
 
+import re
 import uuid
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import selectinload
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import (
+    select, insert, update, delete, func, literal, literal_column, tuple_, and_, or_, case, cast, text,
+    table, column, Float
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import OperationalError
 from .database import (
-    Conversation, Message, KnowledgeEntry, User,
+    Conversation, Message, KnowledgeEntry, User, TEXT_SEARCH_CONFIG,
     get_async_db
 )
 
+# 键集分页游标：上一页最后一行的 (排序列, id)
+Cursor = Tuple[datetime, str]
+
+
+def keyset_page(query, columns, cursor: Optional[Cursor], limit: Optional[int], order: str = "desc"):
+    """
+    为查询添加 (排序列, id) 键集分页，columns 为 (排序列, id 列)
+
+    与 OFFSET 不同，翻到任意深度都只需在索引上定位一次，延迟与表大小无关。
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order!r}")
+    if cursor is not None:
+        position = tuple_(*columns)
+        query = query.where(position < tuple_(*cursor) if order == "desc" else position > tuple_(*cursor))
+    query = query.order_by(*[c.desc() if order == "desc" else c.asc() for c in columns])
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+# 搜索结果片段中命中词的默认高亮标记
+HIGHLIGHT = ("<mark>", "</mark>")
+SNIPPET_CHARS = 80
+
+# 搜索结果返回的摘要列（不含正文）
+_KNOWLEDGE_SUMMARY = (
+    KnowledgeEntry.id,
+    KnowledgeEntry.title,
+    KnowledgeEntry.conversation_id,
+    KnowledgeEntry.message_id,
+    KnowledgeEntry.tags,
+    KnowledgeEntry.created_at,
+    KnowledgeEntry.updated_at,
+    KnowledgeEntry.view_count,
+)
+
+
+LIKE_ESCAPE = "!"
+
+
+def _like_pattern(term: str) -> str:
+    """子串匹配的 LIKE 模式（转义通配符）"""
+    escaped = term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"%{escaped}%"
+
+
+def _contains_all(terms: List[str], columns, ilike: bool = False):
+    """每个词都须出现在任一列中"""
+    def match(column, pattern):
+        return column.ilike(pattern, escape=LIKE_ESCAPE) if ilike else column.like(pattern, escape=LIKE_ESCAPE)
+    return and_(*[or_(*[match(column, _like_pattern(term)) for column in columns]) for term in terms])
+
+
+def _snippet(text_: str, terms: List[str], highlight: Tuple[str, str], width: int = SNIPPET_CHARS) -> str:
+    """截取第一个命中词附近的片段并高亮所有命中词"""
+    lowered = text_.lower()
+    positions = [p for p in (lowered.find(term.lower()) for term in terms) if p >= 0]
+    start = max(min(positions) - width // 4, 0) if positions else 0
+    end = start + width
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    excerpt = pattern.sub(lambda m: f"{highlight[0]}{m.group(0)}{highlight[1]}", text_[start:end])
+    return ("…" if start > 0 else "") + excerpt + ("…" if end < len(text_) else "")
+
+
+def _search_result(row, snippet: str, score: float) -> Dict[str, Any]:
+    result = {column.key: row._mapping[column.key] for column in _KNOWLEDGE_SUMMARY}
+    result["snippet"] = snippet
+    result["score"] = float(score or 0.0)
+    return result
+
+
+def _sqlite_tag_filters(tags: Optional[List[str]]):
+    return [
+        text(f"EXISTS (SELECT 1 FROM json_each(knowledge_entries.tags) WHERE json_each.value = :tag_{i})")
+        .bindparams(**{f"tag_{i}": tag})
+        for i, tag in enumerate(tags or [])
+    ]
+
+
+async def _search_sqlite(db: AsyncSession, terms, limit, tags, highlight) -> List[Dict[str, Any]]:
+    """
+    FTS5 trigram 索引：不少于 3 个字符的词走索引，更短的词在命中行上再做 LIKE 过滤
+
+    trigram 无法索引 1~2 个字符的词（如中文常见的双字词“模型”“学习”）。
+    只要查询中有一个较长的词就仍走索引；所有词都很短时退化为
+    _search_substring 的全表扫描（按词频排序），大表上会明显变慢，
+    此时建议用户补充更长的词。
+    """
+    indexed = [term for term in terms if len(term) >= 3]
+    if not indexed:
+        return await _search_substring(db, terms, limit, tags, highlight)
+    fts = literal_column("knowledge_fts")
+    score = -func.bm25(fts, 10.0, 1.0)  # bm25 越小越相关；标题权重 10
+    query = (
+        select(
+            *_KNOWLEDGE_SUMMARY,
+            func.snippet(fts, -1, highlight[0], highlight[1], "…", 64).label("snippet"),
+            score.label("score"),
+        )
+        .select_from(table("knowledge_fts", column("rowid")).join(
+            KnowledgeEntry, literal_column("knowledge_entries.rowid") == literal_column("knowledge_fts.rowid")
+        ))
+        .where(fts.op("MATCH")(" ".join('"%s"' % term.replace('"', '""') for term in indexed)))
+        .where(*_sqlite_tag_filters(tags))
+        .order_by(score.desc())
+        .limit(limit)
+    )
+    short = [term for term in terms if len(term) < 3]
+    if short:
+        query = query.where(_contains_all(short, (KnowledgeEntry.title, KnowledgeEntry.content)))
+    result = await db.execute(query)
+    return [_search_result(row, row.snippet, row.score) for row in result.all()]
+
+
+async def _search_postgres(db: AsyncSession, query_text: str, terms, limit, tags, highlight) -> List[Dict[str, Any]]:
+    """tsvector 命中或全部词的子串命中（pg_trgm 索引）；标题子串命中额外加分"""
+    vector = literal_column("knowledge_entries.search_vector")
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig"), query_text)
+    in_title = _contains_all(terms, (KnowledgeEntry.title,), ilike=True)
+    score = func.ts_rank_cd(vector, tsquery) + case((in_title, 1.0), else_=0.0)
+    query = (
+        select(*_KNOWLEDGE_SUMMARY, KnowledgeEntry.content, score.label("score"))
+        .where(or_(
+            vector.op("@@")(tsquery),
+            _contains_all(terms, (KnowledgeEntry.title, KnowledgeEntry.content), ilike=True),
+        ))
+        .order_by(score.desc(), KnowledgeEntry.updated_at.desc())
+        .limit(limit)
+    )
+    if tags:
+        query = query.where(cast(KnowledgeEntry.tags, JSONB).contains(tags))
+    result = await db.execute(query)
+    return [_search_result(row, _snippet(row.content, terms, highlight), row.score) for row in result.all()]
+
+
+def _occurrences(column, term: str):
+    """列中 term 出现的次数（不区分大小写）"""
+    lowered = func.lower(column)
+    return (func.length(lowered) - func.length(func.replace(lowered, term.lower(), ""))) / len(term)
+
+
+def _substring_score(terms: List[str]):
+    """
+    子串扫描的相关度：每个词在标题和正文中的词频，饱和后求和，标题权重 10
+
+    与 bm25 一样，词频的边际收益递减（tf / (tf + 1)），长文档不会仅凭重复取胜。
+    """
+    def saturated(column, term):
+        tf = cast(_occurrences(column, term), Float)
+        return tf / (tf + 1.0)
+    return sum(
+        10.0 * saturated(KnowledgeEntry.title, term) + saturated(KnowledgeEntry.content, term)
+        for term in terms
+    )
+
+
+async def _search_substring(db: AsyncSession, terms, limit, tags, highlight) -> List[Dict[str, Any]]:
+    """
+    子串扫描：无全文索引可用，或 SQLite 下所有词都短于 3 个字符时使用
+
+    需要扫描整张表，延迟随条目数线性增长；结果按词频相关度排序。
+    """
+    score = _substring_score(terms)
+    query = (
+        select(*_KNOWLEDGE_SUMMARY, KnowledgeEntry.content, score.label("score"))
+        .where(_contains_all(terms, (KnowledgeEntry.title, KnowledgeEntry.content), ilike=True))
+        .order_by(score.desc(), KnowledgeEntry.updated_at.desc())
+        .limit(limit)
+    )
+    if tags and db.get_bind().dialect.name == "sqlite":
+        query = query.where(*_sqlite_tag_filters(tags))
+    result = await db.execute(query)
+    rows = [_search_result(row, _snippet(row.content, terms, highlight), row.score) for row in result.all()]
+    if tags and db.get_bind().dialect.name != "sqlite":
+        rows = [row for row in rows if set(tags) <= set(row["tags"] or [])]
+    return rows
+
+
 class ConversationService:
     """对话服务"""
 
     @staticmethod
-    async def create_conversation(db: AsyncSession, title: str = None) -> Conversation:
+    async def create_conversation(
+        db: AsyncSession,
+        title: str = None,
+        conversation_id: str = None
+    ) -> Conversation:
         """创建新对话"""
-        conversation_id = str(uuid.uuid4())
+        conversation_id = conversation_id or str(uuid.uuid4())
         conversation = Conversation(
             id=conversation_id,
             title=title or "新对话",
@@ -40,14 +229,23 @@ class ConversationService:
         return result.scalar_one_or_none()
 
     @staticmethod
-    async def list_conversations(db: AsyncSession) -> List[Conversation]:
-        """获取对话列表"""
-        result = await db.execute(
-            select(Conversation)
-            .options(selectinload(Conversation.messages))
-            .order_by(Conversation.updated_at.desc())
+    async def list_conversations(
+        db: AsyncSession,
+        limit: Optional[int] = 50,
+        cursor: Optional[Cursor] = None,
+        order: str = "desc"
+    ) -> List[Row]:
+        """获取对话列表（仅摘要列，按 (created_at, id) 键集分页，默认最新创建在前）"""
+        query = select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+            Conversation.message_count,
         )
-        return result.scalars().all()
+        query = keyset_page(query, (Conversation.created_at, Conversation.id), cursor, limit, order)
+        result = await db.execute(query)
+        return result.all()
 
     @staticmethod
     async def update_conversation_title(
@@ -78,9 +276,88 @@ class ConversationService:
         )
         await db.commit()
 
+    @staticmethod
+    async def fork_conversation(
+        db: AsyncSession,
+        conversation_id: str,
+        title: Optional[str] = None
+    ) -> Optional[Conversation]:
+        """
+        复制对话及其全部消息（同一事务）
+
+        消息由一条 INSERT ... SELECT 在数据库内复制，无论对话多长都只需
+        固定次数的往返。新消息 ID 为 "<新对话ID>:<原消息ID>"。
+
+        Returns:
+            新对话，原对话不存在时返回 None
+        """
+        source = await db.get(Conversation, conversation_id)
+        if source is None:
+            return None
+        now = datetime.utcnow()
+        conversation = Conversation(
+            id=str(uuid.uuid4()),
+            title=title or source.title,
+            created_at=now,
+            updated_at=now,
+            message_count=source.message_count or 0,
+        )
+        db.add(conversation)
+        await db.flush()
+        columns = [
+            "role", "content", "created_at", "stage1_responses", "stage2_rankings",
+            "stage2_metadata", "stage3_response", "loading_stage1", "loading_stage2", "loading_stage3",
+        ]
+        await db.execute(
+            insert(Message).from_select(
+                ["id", "conversation_id", *columns],
+                select(
+                    literal(f"{conversation.id}:") + Message.id,
+                    literal(conversation.id),
+                    *[getattr(Message, column) for column in columns],
+                ).where(Message.conversation_id == conversation_id),
+            )
+        )
+        await db.commit()
+        return conversation
+
+    @staticmethod
+    async def delete_conversation(db: AsyncSession, conversation_id: str) -> bool:
+        """删除对话及其全部消息（同一事务）"""
+        await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+        result = await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+        await db.commit()
+        return result.rowcount > 0
+
 class MessageService:
     """消息服务"""
 
+    @staticmethod
+    async def _reserve(db: AsyncSession, conversation_id: str, count: int, now: datetime) -> int:
+        """
+        在当前事务中为对话增加 count 条消息计数
+
+        UPDATE ... RETURNING 一次往返同时完成计数和存在性检查；行锁一直持有到
+        提交，并发写入同一对话时计数不会丢失。
+
+        Returns:
+            更新后的消息总数
+
+        Raises:
+            ValueError: 对话不存在
+        """
+        result = await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(message_count=func.coalesce(Conversation.message_count, 0) + count, updated_at=now)
+            .returning(Conversation.message_count)
+        )
+        message_count = result.scalar_one_or_none()
+        if message_count is None:
+            await db.rollback()
+            raise ValueError(f"Conversation {conversation_id} not found")
+        return message_count
+
     @staticmethod
     async def create_message(
         db: AsyncSession,
@@ -92,10 +369,19 @@ class MessageService:
         stage2_metadata: Dict = None,
         stage3_response: Dict = None
     ) -> Message:
-        """创建新消息"""
-        message_id = str(uuid.uuid4())
+        """
+        创建新消息
+
+        计数更新与插入在同一事务中完成，只提交一次；所有字段都在本地生成，
+        提交后无需 refresh。
+
+        Raises:
+            ValueError: 对话不存在
+        """
+        now = datetime.utcnow()
+        await MessageService._reserve(db, conversation_id, 1, now)
         message = Message(
-            id=message_id,
+            id=str(uuid.uuid4()),
             conversation_id=conversation_id,
             role=role,
             content=content,
@@ -103,16 +389,54 @@ class MessageService:
             stage2_rankings=stage2_rankings,
             stage2_metadata=stage2_metadata,
             stage3_response=stage3_response,
-            created_at=datetime.utcnow()
+            created_at=now
         )
         db.add(message)
         await db.commit()
-        await db.refresh(message)
+        return message
 
-        # 更新对话消息计数
-        await ConversationService.increment_message_count(db, conversation_id)
+    @staticmethod
+    async def create_messages(
+        db: AsyncSession,
+        conversation_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> int:
+        """
+        批量创建消息（导入、复制、回放）
 
-        return message
+        一条计数 UPDATE、一次 executemany 插入、一次提交，与消息数量无关。
+        created_at 按微秒递增，保证读取顺序与传入顺序一致。
+
+        Args:
+            messages: 字典列表，键同 create_message 的参数
+                      (role, content, stage1_responses, stage2_rankings,
+                      stage2_metadata, stage3_response)
+
+        Returns:
+            更新后的消息总数
+
+        Raises:
+            ValueError: 对话不存在
+        """
+        now = datetime.utcnow()
+        message_count = await MessageService._reserve(db, conversation_id, len(messages), now)
+        if messages:
+            await db.execute(insert(Message), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "conversation_id": conversation_id,
+                    "role": message["role"],
+                    "content": message.get("content") or "",
+                    "stage1_responses": message.get("stage1_responses"),
+                    "stage2_rankings": message.get("stage2_rankings"),
+                    "stage2_metadata": message.get("stage2_metadata"),
+                    "stage3_response": message.get("stage3_response"),
+                    "created_at": now + timedelta(microseconds=i),
+                }
+                for i, message in enumerate(messages)
+            ])
+        await db.commit()
+        return message_count
 
     @staticmethod
     async def update_message_stage(
@@ -184,36 +508,66 @@ class KnowledgeService:
     @staticmethod
     async def list_knowledge_entries(
         db: AsyncSession,
-        limit: int = 50,
-        offset: int = 0
-    ) -> List[KnowledgeEntry]:
-        """获取知识库条目列表"""
-        result = await db.execute(
-            select(KnowledgeEntry)
-            .order_by(KnowledgeEntry.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
+        limit: Optional[int] = 50,
+        cursor: Optional[Cursor] = None
+    ) -> List[Row]:
+        """获取知识库条目列表（不含正文，按 (updated_at, id) 键集分页，最近更新在前）"""
+        query = select(
+            KnowledgeEntry.id,
+            KnowledgeEntry.title,
+            KnowledgeEntry.conversation_id,
+            KnowledgeEntry.message_id,
+            KnowledgeEntry.tags,
+            KnowledgeEntry.created_at,
+            KnowledgeEntry.updated_at,
+            KnowledgeEntry.view_count,
         )
-        return result.scalars().all()
+        query = keyset_page(query, (KnowledgeEntry.updated_at, KnowledgeEntry.id), cursor, limit)
+        result = await db.execute(query)
+        return result.all()
 
     @staticmethod
     async def search_knowledge_entries(
         db: AsyncSession,
         query: str,
-        limit: int = 20
-    ) -> List[KnowledgeEntry]:
-        """搜索知识库条目"""
-        # 简单的文本搜索，实际项目中可能需要使用全文搜索
-        result = await db.execute(
-            select(KnowledgeEntry)
-            .where(
-                func.lower(KnowledgeEntry.title).contains(func.lower(query)) |
-                func.lower(KnowledgeEntry.content).contains(func.lower(query))
-            )
-            .order_by(KnowledgeEntry.updated_at.desc())
-            .limit(limit)
-        )
-        return result.scalars().all()
+        limit: int = 20,
+        tags: Optional[List[str]] = None,
+        highlight: Tuple[str, str] = HIGHLIGHT
+    ) -> List[Dict[str, Any]]:
+        """
+        全文搜索知识库条目，按相关度排序
+
+        SQLite 使用 FTS5（BM25 排序，标题权重更高）；PostgreSQL 使用 tsvector
+        GIN 索引（ts_rank_cd 排序），并以 pg_trgm 索引加速中文子串匹配。
+        索引由数据库随写入增量维护（见 database._create_search_index）。
+
+        限制：SQLite 的 trigram 索引只能命中 3 个字符及以上的词。查询全部
+        由 1~2 个字符的词组成时（如“模型”），改为全表子串扫描并按词频排序，
+        延迟随条目数增长。
+
+        Args:
+            query: 搜索词，空格分隔的多个词须全部命中
+            limit: 最多返回的条目数
+            tags: 只返回包含全部这些标签的条目
+            highlight: 片段中命中词两侧的标记
+
+        Returns:
+            条目摘要字典列表（不含正文），附带高亮片段 snippet 和相关度 score
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            return await _search_postgres(db, query, terms, limit, tags, highlight)
+        if dialect == "sqlite":
+            try:
+                return await _search_sqlite(db, terms, limit, tags, highlight)
+            except OperationalError as e:
+                # 没有 FTS5 时退化为子串扫描
+                await db.rollback()
+                print(f"⚠️ 知识库全文索引不可用: {e}")
+        return await _search_substring(db, terms, limit, tags, highlight)
 
     @staticmethod
     async def increment_view_count(db: AsyncSession, entry_id: str):
@@ -0,0 +1,146 @@
+"""Hedged (speculative duplicate) requests for tail-latency control."""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from .config import (
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_LATENCY_WINDOW,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_BUDGET_BURST,
+    HEDGE_BACKUP_MODELS,
+)
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies per model."""
+
+    def __init__(self, window: int = HEDGE_LATENCY_WINDOW):
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, model: str, seconds: float):
+        """Add a latency sample for a model."""
+        self._samples[model].append(seconds)
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        """
+        Latency percentile for a model.
+
+        Args:
+            model: Model identifier
+            q: Percentile as a fraction (0.9 = p90)
+
+        Returns:
+            Seconds, or None until HEDGE_MIN_SAMPLES samples exist
+        """
+        samples = self._samples.get(model)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """Caps hedges to a fraction of requests: each request earns `ratio` credit, a hedge spends 1."""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = 0.0
+
+    def earn(self):
+        self.credits = min(self.burst, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credits >= 1.0:
+            self.credits -= 1.0
+            return True
+        return False
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+_stats: Dict[str, Dict[str, int]] = defaultdict(
+    lambda: {"requests": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "budget_denied": 0}
+)
+
+
+async def hedged_call(
+    model: str,
+    call: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Run call(model), hedging with a duplicate if it is slower than usual.
+
+    The duplicate goes to HEDGE_BACKUP_MODELS[model] when configured, otherwise
+    to the same model. The first successful result wins and the other request
+    is cancelled.
+
+    Args:
+        model: Model identifier (used for latency history and stats)
+        call: Coroutine factory taking the model identifier to query
+
+    Returns:
+        The winning response, or None if every attempt failed
+    """
+    stats = _stats[model]
+    stats["requests"] += 1
+    hedge_budget.earn()
+
+    async def timed(target: str) -> Optional[Dict[str, Any]]:
+        started = time.monotonic()
+        result = await call(target)
+        if result is not None:
+            latency_tracker.record(model, time.monotonic() - started)
+        return result
+
+    primary = asyncio.create_task(timed(model))
+    hedge = None
+    try:
+        delay = latency_tracker.percentile(model, HEDGE_PERCENTILE)
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if not hedge_budget.try_spend():
+            stats["budget_denied"] += 1
+            return await primary
+
+        stats["hedged"] += 1
+        hedge = asyncio.create_task(timed(HEDGE_BACKUP_MODELS.get(model, model)))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result is not None:
+                    stats["hedge_wins" if task is hedge else "primary_wins"] += 1
+                    return result
+        return None
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def hedging_stats() -> Dict[str, Any]:
+    """Per-model hedge counts, win rates and current hedge thresholds."""
+    models = {}
+    for model, counters in _stats.items():
+        hedged = counters["hedged"]
+        threshold = latency_tracker.percentile(model, HEDGE_PERCENTILE)
+        models[model] = {
+            **counters,
+            "hedge_rate": round(hedged / counters["requests"], 3) if counters["requests"] else 0.0,
+            "hedge_win_rate": round(counters["hedge_wins"] / hedged, 3) if hedged else 0.0,
+            "hedge_after_seconds": round(threshold, 3) if threshold is not None else None,
+        }
+    return {
+        "budget_ratio": hedge_budget.ratio,
+        "budget_credits": round(hedge_budget.credits, 2),
+        "models": models,
+    }
@@ -0,0 +1,128 @@
+"""Long-lived, pooled HTTP clients for the LLM providers."""
+
+import importlib.util
+import weakref
+from collections import defaultdict
+from typing import Dict, Any, Optional
+
+import httpx
+
+from .config import (
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    HTTP_POOL_KEEPALIVE_EXPIRY,
+    HTTP_POOL_CONNECT_TIMEOUT,
+    HTTP_POOL_HTTP2,
+)
+
+
+class ClientManager:
+    """
+    Owns one keep-alive connection pool per provider.
+
+    Clients are created by start() (called from the FastAPI lifespan hook) and
+    closed by aclose(). A client requested before start() is created lazily so
+    that scripts calling query_model directly keep working.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_POOL_KEEPALIVE_EXPIRY,
+        connect_timeout: float = HTTP_POOL_CONNECT_TIMEOUT,
+        http2: bool = HTTP_POOL_HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._seen_streams: Dict[str, weakref.WeakSet] = defaultdict(weakref.WeakSet)
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "new_connections": 0, "reused_connections": 0}
+        )
+
+    async def start(self, providers: Optional[list] = None):
+        """
+        Eagerly create clients for the given providers.
+
+        Args:
+            providers: Provider names to warm up
+        """
+        for provider in providers or []:
+            self.get_client(provider)
+
+    def get_client(self, provider: str) -> httpx.AsyncClient:
+        """
+        Get the pooled client for a provider, creating it on first use.
+
+        Args:
+            provider: Provider name (e.g. "deepseek")
+
+        Returns:
+            A shared httpx.AsyncClient
+        """
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=httpx.Timeout(120.0, connect=self.connect_timeout),
+                event_hooks={"response": [self._make_response_hook(provider)]},
+            )
+            self._clients[provider] = client
+        return client
+
+    def _make_response_hook(self, provider: str):
+        """Build a response hook that records connection reuse for a provider."""
+        async def hook(response: httpx.Response):
+            stats = self._stats[provider]
+            stats["requests"] += 1
+            stream = response.extensions.get("network_stream")
+            if stream is None:
+                return
+            seen = self._seen_streams[provider]
+            if stream in seen:
+                stats["reused_connections"] += 1
+            else:
+                seen.add(stream)
+                stats["new_connections"] += 1
+        return hook
+
+    async def aclose(self):
+        """Close every pooled client."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Connection-reuse statistics per provider.
+
+        Returns:
+            Dict with pool settings and per-provider request/connection counters
+        """
+        providers = {}
+        for provider, counters in self._stats.items():
+            requests = counters["requests"]
+            providers[provider] = {
+                **counters,
+                "reuse_ratio": round(counters["reused_connections"] / requests, 3) if requests else 0.0,
+                "open": provider in self._clients and not self._clients[provider].is_closed,
+            }
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "providers": providers,
+        }
+
+
+# Shared instance used by the provider adapters
+client_manager = ClientManager()
@@ -1,18 +1,46 @@
 """FastAPI backend for LLM Council."""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uuid
 import json
 import asyncio
-
-from . import storage
-from .council import run_full_council, generate_conversation_title, stage1_collect_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings
-
-app = FastAPI(title="LLM Council API")
+from contextlib import asynccontextmanager
+
+from .storage_backends import create_storage_backend
+from .config import COUNCIL_MODELS, CHAIRMAN_MODEL
+from .council import run_full_council, generate_conversation_title
+from .http_pool import client_manager
+from .openrouter import parse_model_identifier
+from .scheduler import scheduler_stats
+from .hedging import hedging_stats
+from .resilience import breaker_stats
+from .response_cache import response_cache
+from .council_cache import council_cache
+from .conversation_cache import conversation_cache
+from .single_flight import council_flights
+
+# Conversation store selected by STORAGE_BACKEND (file, sqlite or postgres)
+storage = create_storage_backend()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open provider connection pools and the conversation store; close them on shutdown."""
+    providers = {parse_model_identifier(model)[0] for model in COUNCIL_MODELS + [CHAIRMAN_MODEL]}
+    await client_manager.start(sorted(providers))
+    await storage.start()
+    yield
+    await client_manager.aclose()
+    response_cache.close()
+    council_cache.close()
+    await storage.close()
+
+
+app = FastAPI(title="LLM Council API", lifespan=lifespan)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -21,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -56,23 +85,60 @@ async def root():
     return {"status": "ok", "service": "LLM Council API"}
 
 
+@app.get("/api/stats")
+async def get_stats():
+    """Runtime statistics: provider pools, schedulers, hedging, breakers and caches."""
+    return {
+        "http_pool": client_manager.stats(),
+        "schedulers": scheduler_stats(),
+        "hedging": hedging_stats(),
+        "circuit_breakers": breaker_stats(),
+        "response_cache": response_cache.stats(),
+        "council_cache": council_cache.stats(),
+        "single_flight": council_flights.stats(),
+        "conversation_cache": conversation_cache.stats(),
+    }
+
+
+@app.get("/api/providers/circuit-breakers")
+async def get_circuit_breakers():
+    """Circuit breaker state per provider (closed, open or half_open)."""
+    return breaker_stats()
+
+
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
-async def list_conversations():
-    """List all conversations (metadata only)."""
-    return storage.list_conversations()
+async def list_conversations(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$")
+):
+    """
+    List conversations (metadata only), newest first by default.
+
+    With `limit`, returns one page; the cursor of the next page is sent in
+    the X-Next-Cursor header (absent on the last page).
+    """
+    try:
+        conversations, next_cursor = await storage.list_conversations_page(limit, cursor, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return conversations
 
 
 @app.post("/api/conversations", response_model=Conversation)
 async def create_conversation(request: CreateConversationRequest):
     """Create a new conversation."""
-    conversation = storage.create_conversation()
+    conversation = await storage.create_conversation()
     return conversation
 
 
 @app.get("/api/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(conversation_id: str):
     """Get a specific conversation with all its messages."""
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
@@ -85,7 +151,7 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     Returns the complete response with all stages.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -93,20 +159,25 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     is_first_message = len(conversation["messages"]) == 0
 
     # Add user message
-    storage.add_user_message(conversation_id, request.content)
+    await storage.add_user_message(conversation_id, request.content)
 
     # If this is the first message, generate a title
     if is_first_message:
         title = await generate_conversation_title(request.content)
-        storage.update_conversation_title(conversation_id, title)
+        await storage.update_conversation_title(conversation_id, title)
 
-    # Run the 3-stage council process
-    stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
-        request.content
+    # Run the 3-stage council process (shared with identical in-flight requests)
+    flight, events = council_flights.join(
+        request.content,
+        lambda on_event: run_full_council(request.content, on_event=on_event)
     )
+    try:
+        stage1_results, stage2_results, stage3_result, metadata = await asyncio.shield(flight.task)
+    finally:
+        council_flights.leave(flight, events)
 
     # Add assistant message with all stages
-    storage.add_assistant_message(
+    await storage.add_assistant_message(
         conversation_id,
         stage1_results,
         stage2_results,
@@ -122,6 +193,34 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     }
 
 
+async def _drain_events(task: asyncio.Task, events: asyncio.Queue):
+    """
+    Yield events from a queue until the producing task has finished.
+
+    Args:
+        task: Task that puts events on the queue
+        events: Queue the task writes to
+
+    Yields:
+        Each queued event, in order; events queued before the task finished
+        are always delivered
+    """
+    while True:
+        next_event = asyncio.ensure_future(events.get())
+        try:
+            done, _ = await asyncio.wait({next_event, task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Also reached when the client disconnects mid-wait
+            if not next_event.done():
+                next_event.cancel()
+        if next_event in done:
+            yield next_event.result()
+            continue
+        while not events.empty():
+            yield events.get_nowait()
+        return
+
+
 @app.post("/api/conversations/{conversation_id}/message/stream")
 async def send_message_stream(conversation_id: str, request: SendMessageRequest):
     """
@@ -129,7 +228,7 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
     Returns Server-Sent Events as each stage completes.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -137,39 +236,35 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
     is_first_message = len(conversation["messages"]) == 0
 
     async def event_generator():
+        flight = None
         try:
             # Add user message
-            storage.add_user_message(conversation_id, request.content)
+            await storage.add_user_message(conversation_id, request.content)
 
             # Start title generation in parallel (don't await yet)
             title_task = None
             if is_first_message:
                 title_task = asyncio.create_task(generate_conversation_title(request.content))
 
-            # Stage 1: Collect responses
-            yield f"data: {json.dumps({'type': 'stage1_start'})}\n\n"
-            stage1_results = await stage1_collect_responses(request.content)
-            yield f"data: {json.dumps({'type': 'stage1_complete', 'data': stage1_results})}\n\n"
-
-            # Stage 2: Collect rankings
-            yield f"data: {json.dumps({'type': 'stage2_start'})}\n\n"
-            stage2_results, label_to_model = await stage2_collect_rankings(request.content, stage1_results)
-            aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-            yield f"data: {json.dumps({'type': 'stage2_complete', 'data': stage2_results, 'metadata': {'label_to_model': label_to_model, 'aggregate_rankings': aggregate_rankings}})}\n\n"
-
-            # Stage 3: Synthesize final answer
-            yield f"data: {json.dumps({'type': 'stage3_start'})}\n\n"
-            stage3_result = await stage3_synthesize_final(request.content, stage1_results, stage2_results)
-            yield f"data: {json.dumps({'type': 'stage3_complete', 'data': stage3_result})}\n\n"
+            # Run the council in the background, or subscribe to an identical
+            # run already in flight, and forward its events (stage transitions
+            # plus stage-1/stage-3 token deltas) as they happen
+            flight, events = council_flights.join(
+                request.content,
+                lambda on_event: run_full_council(request.content, on_event=on_event)
+            )
+            async for event in _drain_events(flight.task, events):
+                yield f"data: {json.dumps(event)}\n\n"
+            stage1_results, stage2_results, stage3_result, metadata = flight.task.result()
 
             # Wait for title generation if it was started
             if title_task:
                 title = await title_task
-                storage.update_conversation_title(conversation_id, title)
+                await storage.update_conversation_title(conversation_id, title)
                 yield f"data: {json.dumps({'type': 'title_complete', 'data': {'title': title}})}\n\n"
 
             # Save complete assistant message
-            storage.add_assistant_message(
+            await storage.add_assistant_message(
                 conversation_id,
                 stage1_results,
                 stage2_results,
@@ -182,6 +277,10 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
         except Exception as e:
             # Send error event
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        finally:
+            # Stop the council if this was the last client and it went away mid-run
+            if flight:
+                council_flights.leave(flight, events)
 
     return StreamingResponse(
         event_generator(),
@@ -210,13 +309,13 @@ async def delete_conversation(conversation_id: str):
     Delete a conversation and all its messages.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="对话不存在")
 
     try:
         # Delete the conversation
-        storage.delete_conversation(conversation_id)
+        await storage.delete_conversation(conversation_id)
         return DeleteConversationResponse(
             success=True,
             message="对话删除成功"
@@ -230,39 +329,27 @@ async def copy_conversation(conversation_id: str, request: CopyConversationReque
     """
     Copy an entire conversation to create a new one.
     """
-    # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
-    if conversation is None:
-        raise HTTPException(status_code=404, detail="对话不存在")
-
+    new_title = request.title if request and request.title else None
     try:
-        # Create new conversation with copy of messages
-        new_title = request.title if request and request.title else f"{conversation['title']} - 副本"
-        new_conversation = storage.create_conversation()
-
-        # Update title
-        storage.update_conversation_title(new_conversation["id"], new_title)
-
-        # Copy all messages
-        for message in conversation["messages"]:
-            storage.add_message(
-                new_conversation["id"],
-                message["role"],
-                message.get("content", ""),
-                message.get("stage1", None),
-                message.get("stage2", None),
-                message.get("stage3", None)
-            )
-
-        return ConversationMetadata(
-            id=new_conversation["id"],
-            created_at=new_conversation["created_at"],
-            title=new_title,
-            message_count=len(conversation["messages"])
-        )
+        # Fork the conversation; the file backend shares the existing history
+        # instead of copying it
+        new_conversation = await storage.fork_conversation(conversation_id, new_title)
+        if new_conversation is not None and new_title is None:
+            new_title = f"{new_conversation['title']} - 副本"
+            await storage.update_conversation_title(new_conversation["id"], new_title)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"复制对话失败: {str(e)}")
 
+    if new_conversation is None:
+        raise HTTPException(status_code=404, detail="对话不存在")
+
+    return ConversationMetadata(
+        id=new_conversation["id"],
+        created_at=new_conversation["created_at"],
+        title=new_title,
+        message_count=new_conversation["message_count"]
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,14 +1,26 @@
 """Multi-provider LLM API client for making requests to different services."""
 
-import httpx
-from typing import List, Dict, Any, Optional
+import asyncio
+import json
+import time
+from typing import List, Dict, Any, Optional, Callable, AsyncIterator, Tuple, Union
+from .http_pool import client_manager
+from .hedging import hedged_call
+from .response_cache import response_cache, cache_key
+from .scheduler import get_scheduler
+from .resilience import classify_error, backoff_delay, get_breaker, UNAVAILABLE, THROTTLED
+from .tokens import estimate_messages_tokens
 from .config import (
     OPENROUTER_API_KEY, OPENROUTER_API_URL,
     DEEPSEEK_API_KEY, DEEPSEEK_API_URL,
     MOONSHOT_API_KEY, MOONSHOT_API_URL,
     MINIMAX_API_KEY, MINIMAX_API_URL,
     ZHIPU_API_KEY, ZHIPU_API_URL,
-    GEMINI_API_KEY, GEMINI_API_URL
+    GEMINI_API_KEY, GEMINI_API_URL,
+    OUTPUT_TOKEN_RESERVE,
+    HEDGING_ENABLED,
+    RETRY_MAX_ATTEMPTS,
+    RESPONSE_CACHE_ENABLED,
 )
 
 
@@ -31,246 +43,455 @@ def parse_model_identifier(model: str) -> tuple[str, str]:
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float = 120.0
+    timeout: float = 120.0,
+    stream: bool = False,
+    on_delta: Optional[Callable[[str], None]] = None,
+    json_schema: Optional[Dict[str, Any]] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Query a single model via appropriate API provider.
 
+    The request goes through the provider's scheduler, which enforces the
+    concurrency and rate limits and backs off on 429 responses. Non-streaming
+    calls are hedged with a duplicate request when they run past the model's
+    usual latency (see backend/hedging.py). Streaming calls (stage 1 and
+    stage 3 in the UI) are never hedged: deltas from two racing requests
+    cannot be merged, and a duplicate fired on slow time-to-first-byte would
+    still need a way to discard the loser's partial output, so a slow stream
+    is only bounded by its timeout and retries. Identical requests are
+    answered from the response cache; a cached answer is streamed as a single
+    delta.
+
     Args:
         model: Model identifier (e.g., "openrouter:x-ai/grok-4.1-fast:free", "deepseek:deepseek-chat")
         messages: List of message dicts with 'role' and 'content'
-        timeout: Request timeout in seconds
+        timeout: Overall budget in seconds, including time spent queued
+        stream: Use the provider's streaming API
+        on_delta: Called with each content fragment as it arrives (stream only)
+        json_schema: Ask for a JSON answer matching this schema, enforced by
+            providers that support response schemas and requested as plain
+            JSON mode from the others (see _JSON_MODES)
 
     Returns:
         Response dict with 'content' and optional 'reasoning_details', or None if failed
     """
+    use_cache = RESPONSE_CACHE_ENABLED and response_cache.enabled_for(model)
+    if use_cache:
+        key = cache_key(model, messages, {"json_schema": json_schema} if json_schema else None)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            if stream and on_delta and cached.get('content'):
+                on_delta(cached['content'])
+            return cached
+
+    if stream or not HEDGING_ENABLED:
+        response = await _query_model_once(model, messages, timeout, stream, on_delta, json_schema)
+    else:
+        # A hedge fired late only gets what is left of the caller's budget
+        deadline = time.monotonic() + timeout
+
+        async def attempt(target: str) -> Optional[Dict[str, Any]]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            return await _query_model_once(target, messages, remaining, json_schema=json_schema)
+
+        response = await hedged_call(model, attempt)
+
+    if use_cache and response is not None and response.get('content'):
+        await response_cache.put(key, model, response)
+    return response
+
+
+async def _query_model_once(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float,
+    stream: bool = False,
+    on_delta: Optional[Callable[[str], None]] = None,
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Send a request to the model's provider (None if failed).
+
+    Connect errors, timeouts, 5xx and 429 responses are retried with jittered
+    backoff while the timeout budget allows; the provider's circuit breaker
+    fails fast while the provider is known to be down. Running out of budget
+    while still queued locally is neither retried nor held against the
+    provider.
+    """
     provider, model_name = parse_model_identifier(model)
 
-    if provider == "openrouter":
-        return await _query_openrouter(model_name, messages, timeout)
-    elif provider == "deepseek":
-        return await _query_deepseek(model_name, messages, timeout)
-    elif provider == "moonshot":
-        return await _query_moonshot(model_name, messages, timeout)
-    elif provider == "minimax":
-        return await _query_minimax(model_name, messages, timeout)
-    elif provider == "zhipu":
-        return await _query_zhipu(model_name, messages, timeout)
+    delivered = False
+    if on_delta:
+        forward = on_delta
+
+        def on_delta(text: str):
+            nonlocal delivered
+            delivered = True
+            forward(text)
+
+    if provider in _OPENAI_COMPATIBLE:
+        async def call(remaining: float):
+            if stream:
+                return await _stream_openai_compatible(
+                    provider, model_name, messages, remaining, on_delta, json_schema
+                )
+            return await _query_openai_compatible(provider, model_name, messages, remaining, json_schema)
     elif provider == "gemini":
-        return await _query_gemini(model_name, messages, timeout)
+        async def call(remaining: float):
+            if stream:
+                return await _stream_gemini(model_name, messages, remaining, on_delta, json_schema)
+            return await _query_gemini(model_name, messages, remaining, json_schema)
     else:
         print(f"Unknown provider: {provider}")
         return None
 
-
-async def _query_openrouter(
+    estimated_tokens = estimate_messages_tokens(messages) + OUTPUT_TOKEN_RESERVE
+    breaker = get_breaker(provider)
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        attempt += 1
+        if deadline - time.monotonic() <= 0:
+            # Out of budget before sending: not the provider's fault
+            return None
+        if not breaker.allow():
+            print(f"Skipping {provider} model {model_name}: circuit open")
+            return None
+        try:
+            result = await get_scheduler(provider).run(call, estimated_tokens, deadline - time.monotonic())
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == UNAVAILABLE:
+                breaker.record_failure()
+            else:
+                breaker.release()
+            # A stream that already emitted deltas cannot be replayed
+            can_retry = kind in (UNAVAILABLE, THROTTLED) and attempt < RETRY_MAX_ATTEMPTS and not delivered
+            delay = backoff_delay(attempt)
+            if not can_retry or time.monotonic() + delay >= deadline:
+                print(f"Error querying {provider} model {model_name}: {e!r}")
+                return None
+            breaker.retries += 1
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
+
+
+# Providers speaking the OpenAI chat-completions protocol: provider -> (url, api key)
+_OPENAI_COMPATIBLE = {
+    "openrouter": (OPENROUTER_API_URL, OPENROUTER_API_KEY),
+    "deepseek": (DEEPSEEK_API_URL, DEEPSEEK_API_KEY),
+    "moonshot": (MOONSHOT_API_URL, MOONSHOT_API_KEY),
+    "minimax": (MINIMAX_API_URL, MINIMAX_API_KEY),
+    "zhipu": (ZHIPU_API_URL, ZHIPU_API_KEY),
+}
+
+# How each provider is asked for JSON: "schema" enforces a response schema,
+# "object" only guarantees a JSON object (the prompt describes the shape).
+# OpenRouter is left at "object" because schema support varies by model.
+_JSON_MODES = {
+    "openrouter": "object",
+    "deepseek": "object",
+    "moonshot": "object",
+    "minimax": "object",
+    "zhipu": "object",
+    "gemini": "schema",
+}
+
+
+def _openai_payload(
+    provider: str,
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float
-) -> Optional[Dict[str, Any]]:
-    """Query OpenRouter API."""
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build an OpenAI-compatible chat completions request body."""
     payload = {
         "model": model,
         "messages": messages,
     }
-
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(OPENROUTER_API_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            message = data['choices'][0]['message']
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
+    if json_schema is not None:
+        if _JSON_MODES.get(provider) == "schema":
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": json_schema, "strict": True},
             }
-    except Exception as e:
-        print(f"Error querying OpenRouter model {model}: {e}")
-        return None
+        elif _JSON_MODES.get(provider) == "object":
+            payload["response_format"] = {"type": "json_object"}
+    return payload
 
 
-async def _query_deepseek(
+async def _query_openai_compatible(
+    provider: str,
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float
-) -> Optional[Dict[str, Any]]:
-    """Query DeepSeek API."""
+    timeout: float,
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Query an OpenAI-compatible chat completions API (raises on failure)."""
+    url, api_key = _OPENAI_COMPATIBLE[provider]
     headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
 
-    payload = {
-        "model": model,
-        "messages": messages,
+    payload = _openai_payload(provider, model, messages, json_schema)
+
+    client = client_manager.get_client(provider)
+    response = await client.post(url, headers=headers, json=payload, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    message = data['choices'][0]['message']
+    return {
+        'content': message.get('content'),
+        'reasoning_details': message.get('reasoning_details'),
+        'usage_tokens': (data.get('usage') or {}).get('total_tokens')
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(DEEPSEEK_API_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            message = data['choices'][0]['message']
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
-    except Exception as e:
-        print(f"Error querying DeepSeek model {model}: {e}")
-        return None
+
+async def _iter_sse_data(response) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the JSON payload of each `data:` line of a server-sent event stream."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            continue
+        yield json.loads(data)
 
 
-async def _query_moonshot(
+async def _stream_openai_compatible(
+    provider: str,
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float
-) -> Optional[Dict[str, Any]]:
-    """Query Moonshot API."""
+    timeout: float,
+    on_delta: Optional[Callable[[str], None]],
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Stream an OpenAI-compatible chat completion, forwarding content deltas."""
+    url, api_key = _OPENAI_COMPATIBLE[provider]
     headers = {
-        "Authorization": f"Bearer {MOONSHOT_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
 
-    payload = {
-        "model": model,
-        "messages": messages,
+    payload = _openai_payload(provider, model, messages, json_schema)
+    payload["stream"] = True
+
+    content_parts = []
+    usage_tokens = None
+    client = client_manager.get_client(provider)
+    async with client.stream("POST", url, headers=headers, json=payload, timeout=timeout) as response:
+        response.raise_for_status()
+        async for chunk in _iter_sse_data(response):
+            if chunk.get("usage"):
+                usage_tokens = chunk["usage"].get("total_tokens")
+            if not chunk.get("choices"):
+                continue
+            delta = (chunk["choices"][0].get("delta") or {}).get("content")
+            if delta:
+                content_parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+
+    return {
+        'content': "".join(content_parts),
+        'reasoning_details': None,
+        'usage_tokens': usage_tokens
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(MOONSHOT_API_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            message = data['choices'][0]['message']
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
-    except Exception as e:
-        print(f"Error querying Moonshot model {model}: {e}")
-        return None
 
+def _gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON schema -> Gemini's OpenAPI subset (upper-case types, no extra keywords)."""
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted["type"] = value.upper()
+        elif key == "properties":
+            converted["properties"] = {name: _gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            converted["items"] = _gemini_schema(value)
+        elif key in ("required", "enum", "description"):
+            converted[key] = value
+    return converted
 
-async def _query_minimax(
-    model: str,
+
+def _gemini_payload(
     messages: List[Dict[str, str]],
-    timeout: float
-) -> Optional[Dict[str, Any]]:
-    """Query MiniMax API."""
-    headers = {
-        "Authorization": f"Bearer {MINIMAX_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Convert chat messages into a Gemini generateContent request body."""
+    contents = []
+    for msg in messages:
+        contents.append({
+            "role": "user" if msg["role"] == "user" else "model",
+            "parts": [{"text": msg["content"]}]
+        })
 
-    payload = {
-        "model": model,
-        "messages": messages,
+    generation_config = {
+        "temperature": 0.7,
+        "topK": 40,
+        "topP": 0.95,
+        "maxOutputTokens": 8192,
     }
+    if json_schema is not None:
+        generation_config["responseMimeType"] = "application/json"
+        if _JSON_MODES.get("gemini") == "schema":
+            generation_config["responseSchema"] = _gemini_schema(json_schema)
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(MINIMAX_API_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            message = data['choices'][0]['message']
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
-    except Exception as e:
-        print(f"Error querying MiniMax model {model}: {e}")
-        return None
+    return {
+        "contents": contents,
+        "generationConfig": generation_config,
+    }
 
 
-async def _query_zhipu(
+async def _query_gemini(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float
-) -> Optional[Dict[str, Any]]:
-    """Query Zhipu API."""
+    timeout: float,
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Query Google Gemini API (raises on failure)."""
     headers = {
-        "Authorization": f"Bearer {ZHIPU_API_KEY}",
         "Content-Type": "application/json",
     }
-
-    payload = {
-        "model": model,
-        "messages": messages,
+    payload = _gemini_payload(messages, json_schema)
+
+    url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
+    client = client_manager.get_client("gemini")
+    response = await client.post(url, headers=headers, json=payload, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+
+    if not data.get("candidates"):
+        raise ValueError(f"No valid response from Gemini: {data}")
+
+    content = data["candidates"][0]["content"]["parts"][0]["text"]
+    return {
+        'content': content,
+        'reasoning_details': None,
+        'usage_tokens': (data.get('usageMetadata') or {}).get('totalTokenCount')
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(ZHIPU_API_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            message = data['choices'][0]['message']
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
-    except Exception as e:
-        print(f"Error querying Zhipu model {model}: {e}")
-        return None
 
-
-async def _query_gemini(
+async def _stream_gemini(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float
-) -> Optional[Dict[str, Any]]:
-    """Query Google Gemini API."""
+    timeout: float,
+    on_delta: Optional[Callable[[str], None]],
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Stream a Gemini completion via streamGenerateContent, forwarding text deltas."""
     headers = {
         "Content-Type": "application/json",
     }
+    payload = _gemini_payload(messages, json_schema)
+
+    stream_url = GEMINI_API_URL.replace(":generateContent", ":streamGenerateContent")
+    url = f"{stream_url}?alt=sse&key={GEMINI_API_KEY}"
+
+    content_parts = []
+    usage_tokens = None
+    client = client_manager.get_client("gemini")
+    async with client.stream("POST", url, headers=headers, json=payload, timeout=timeout) as response:
+        response.raise_for_status()
+        async for chunk in _iter_sse_data(response):
+            if chunk.get("usageMetadata"):
+                usage_tokens = chunk["usageMetadata"].get("totalTokenCount")
+            for candidate in chunk.get("candidates", [])[:1]:
+                for part in (candidate.get("content") or {}).get("parts", []):
+                    delta = part.get("text")
+                    if delta:
+                        content_parts.append(delta)
+                        if on_delta:
+                            on_delta(delta)
+
+    if not content_parts:
+        raise ValueError("No valid response from Gemini stream")
+
+    return {
+        'content': "".join(content_parts),
+        'reasoning_details': None,
+        'usage_tokens': usage_tokens
+    }
 
-    # Convert messages format for Gemini
-    contents = []
-    for msg in messages:
-        contents.append({
-            "role": "user" if msg["role"] == "user" else "model",
-            "parts": [{"text": msg["content"]}]
-        })
 
-    payload = {
-        "contents": contents,
-        "generationConfig": {
-            "temperature": 0.7,
-            "topK": 40,
-            "topP": 0.95,
-            "maxOutputTokens": 8192,
-        }
-    }
+def start_model_queries(
+    models: List[str],
+    messages: Union[List[Dict[str, str]], Dict[str, List[Dict[str, str]]]],
+    on_delta: Optional[Callable[[str, str], None]] = None,
+    json_schema: Optional[Dict[str, Any]] = None,
+    json_schemas: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[asyncio.Task, str]:
+    """
+    Start one query task per model without waiting for any of them.
 
-    try:
-        url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-
-            if "candidates" in data and data["candidates"]:
-                content = data["candidates"][0]["content"]["parts"][0]["text"]
-                return {
-                    'content': content,
-                    'reasoning_details': None
-                }
-            else:
-                print(f"No valid response from Gemini: {data}")
-                return None
+    Args:
+        models: List of model identifiers
+        messages: List of message dicts to send to each model, or a dict of
+            per-model message lists
+        on_delta: If given, stream every model and call on_delta(model, text) per fragment
+        json_schema: If given, ask every model for JSON matching this schema
+        json_schemas: Per-model schemas, overriding json_schema
 
-    except Exception as e:
-        print(f"Error querying Gemini model {model}: {e}")
-        return None
+    Returns:
+        Dict mapping each running task to its model identifier
+    """
+    def start(model: str) -> asyncio.Task:
+        model_messages = messages[model] if isinstance(messages, dict) else messages
+        schema = (json_schemas or {}).get(model, json_schema)
+        if on_delta:
+            coro = query_model(
+                model, model_messages, stream=True,
+                on_delta=lambda text: on_delta(model, text), json_schema=schema
+            )
+        else:
+            coro = query_model(model, model_messages, json_schema=schema)
+        return asyncio.create_task(coro)
+
+    return {start(model): model for model in models}
+
+
+async def query_models_as_completed(
+    models: List[str],
+    messages: List[Dict[str, str]],
+    on_delta: Optional[Callable[[str, str], None]] = None
+) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Query multiple models in parallel, yielding each result as soon as it lands.
+
+    Requests still in flight are cancelled if the caller stops iterating early.
+
+    Args:
+        models: List of model identifiers
+        messages: List of message dicts to send to each model
+        on_delta: If given, stream every model and call on_delta(model, text) per fragment
+
+    Yields:
+        (model, response) tuples in completion order (response is None if failed)
+    """
+    tasks = start_model_queries(models, messages, on_delta)
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield tasks[task], task.result()
+    finally:
+        for task in pending:
+            task.cancel()
 
 
 async def query_models_parallel(
     models: List[str],
-    messages: List[Dict[str, str]]
+    messages: List[Dict[str, str]],
+    on_delta: Optional[Callable[[str, str], None]] = None
 ) -> Dict[str, Optional[Dict[str, Any]]]:
     """
     Query multiple models in parallel.
@@ -278,17 +499,15 @@ async def query_models_parallel(
     Args:
         models: List of OpenRouter model identifiers
         messages: List of message dicts to send to each model
+        on_delta: If given, stream every model and call on_delta(model, text) per fragment
 
     Returns:
-        Dict mapping model identifier to response dict (or None if failed)
+        Dict mapping model identifier to response dict (or None if failed),
+        in the order the models were given
     """
-    import asyncio
-
-    # Create tasks for all models
-    tasks = [query_model(model, messages) for model in models]
-
-    # Wait for all to complete
-    responses = await asyncio.gather(*tasks)
+    responses = {}
+    async for model, response in query_models_as_completed(models, messages, on_delta):
+        responses[model] = response
 
     # Map models to their responses
-    return {model: response for model, response in zip(models, responses)}
+    return {model: responses.get(model) for model in models}
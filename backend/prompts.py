@@ -0,0 +1,198 @@
+"""Token-budgeted assembly of the stage-2 and stage-3 prompt sections."""
+
+from typing import List, Dict, Any, Tuple
+
+from .config import (
+    DEFAULT_CONTEXT_TOKENS,
+    MODEL_CONTEXT_TOKENS,
+    OUTPUT_TOKEN_RESERVE,
+    MIN_RESPONSE_TOKENS,
+    RANKING_RATIONALE_TOKENS,
+)
+from .tokens import estimate_tokens
+
+TRUNCATION_MARKER = "\n[...]\n"
+RANKING_MARKERS = ("最终排名：", "FINAL RANKING:")
+
+
+def context_budget(models: List[str]) -> int:
+    """
+    Prompt tokens available when the same prompt goes to every model.
+
+    Args:
+        models: Models that will receive the prompt
+
+    Returns:
+        Smallest context window among the models, minus the output reserve
+    """
+    window = min(MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) for model in models)
+    return max(window - OUTPUT_TOKEN_RESERVE, 0)
+
+
+def compress_text(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to roughly `max_tokens`, keeping its beginning and end.
+
+    Answers usually state their point up front and conclude at the end, so
+    the middle is dropped first.
+
+    Args:
+        text: Text to shorten
+        max_tokens: Target size in estimated tokens
+
+    Returns:
+        The text unchanged if it fits, otherwise head + marker + tail
+    """
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return TRUNCATION_MARKER.strip()
+    keep = int(len(text) * max_tokens / total)
+    while True:
+        head = keep * 2 // 3
+        tail = keep - head
+        shortened = text[:head].rstrip() + TRUNCATION_MARKER + (text[-tail:].lstrip() if tail else "")
+        if estimate_tokens(shortened) <= max_tokens or keep == 0:
+            return shortened
+        keep = int(keep * 0.9)
+
+
+def allocate_tokens(sizes: List[int], budget: int, floor: int = 0) -> List[int]:
+    """
+    Split a token budget across sections, shortest first.
+
+    Sections that fit within an equal share keep their full size and their
+    leftover is shared among the longer ones (water-filling), so one long
+    answer is capped before several short ones are touched.
+
+    Args:
+        sizes: Token size of each section
+        budget: Total tokens available
+        floor: Minimum allowance per section (may overshoot a tiny budget)
+
+    Returns:
+        Token allowance per section, in input order
+    """
+    allowances = [0] * len(sizes)
+    remaining = budget
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while pending:
+        share = max(remaining // len(pending), floor)
+        i = pending.pop(0)
+        allowances[i] = min(sizes[i], share)
+        remaining -= allowances[i]
+    return allowances
+
+
+def fit_sections(texts: List[str], budget: int, floor: int = MIN_RESPONSE_TOKENS) -> Tuple[List[str], int]:
+    """
+    Shorten texts so together they fit a token budget.
+
+    Args:
+        texts: Section bodies
+        budget: Total tokens for all bodies
+        floor: Never shorten a section below this
+
+    Returns:
+        Tuple of (fitted texts, tokens saved)
+    """
+    sizes = [estimate_tokens(text) for text in texts]
+    if sum(sizes) <= budget:
+        return texts, 0
+    allowances = allocate_tokens(sizes, budget, floor)
+    fitted = [compress_text(text, allowance) for text, allowance in zip(texts, allowances)]
+    return fitted, sum(sizes) - sum(estimate_tokens(text) for text in fitted)
+
+
+def condense_ranking(result: Dict[str, Any], rationale_tokens: int = RANKING_RATIONALE_TOKENS) -> str:
+    """
+    Reduce a stage-2 evaluation to its parsed ranking plus a short rationale.
+
+    Args:
+        result: Stage-2 result with 'ranking' (full text) and 'parsed_ranking'
+        rationale_tokens: Size of the rationale kept
+
+    Returns:
+        Condensed evaluation text
+    """
+    text = result.get('ranking', '')
+    for marker in RANKING_MARKERS:
+        if marker in text:
+            text = text.rsplit(marker, 1)[0]
+            break
+    ranking = ", ".join(result.get('parsed_ranking') or []) or "(unparsed)"
+    return f"{ranking}\nRationale: {compress_text(text.strip(), rationale_tokens)}"
+
+
+def build_ranking_sections(
+    labels: List[str],
+    responses: List[str],
+    budget: int
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Build the anonymized responses block of the stage-2 prompt.
+
+    Args:
+        labels: Response labels ("A", "B", ...)
+        responses: Stage-1 response texts, in label order
+        budget: Tokens available for the block
+
+    Returns:
+        Tuple of (block text, report with 'prompt_tokens' and 'tokens_saved')
+    """
+    responses = [response or "" for response in responses]  # a provider may return null content
+    headers = [f"Response {label}:\n" for label in labels]
+    overhead = sum(estimate_tokens(header) + 1 for header in headers)
+    fitted, saved = fit_sections(responses, budget - overhead)
+    text = "\n\n".join(header + body for header, body in zip(headers, fitted))
+    return text, {"prompt_tokens": estimate_tokens(text), "tokens_saved": saved}
+
+
+def build_chairman_sections(
+    stage1_results: List[Dict[str, Any]],
+    stage2_results: List[Dict[str, Any]],
+    budget: int
+) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Build the stage-1 and stage-2 blocks of the chairman prompt.
+
+    Everything is passed through when it fits. Otherwise the evaluations are
+    condensed first (they mostly restate the responses), then the responses
+    are shortened to fit what is left.
+
+    Args:
+        stage1_results: Stage-1 results with 'model' and 'response'
+        stage2_results: Stage-2 results with 'model', 'ranking' and 'parsed_ranking'
+        budget: Tokens available for both blocks
+
+    Returns:
+        Tuple of (stage1 text, stage2 text, report with 'prompt_tokens',
+        'tokens_saved' and 'condensed_rankings')
+    """
+    def render(results, label, bodies):
+        return "\n\n".join(
+            f"Model: {result['model']}\n{label}: {body}"
+            for result, body in zip(results, bodies)
+        )
+
+    responses = [result['response'] or "" for result in stage1_results]
+    rankings = [result['ranking'] or "" for result in stage2_results]
+    stage1_text = render(stage1_results, "Response", responses)
+    stage2_text = render(stage2_results, "Ranking", rankings)
+    original = estimate_tokens(stage1_text) + estimate_tokens(stage2_text)
+    if original <= budget:
+        return stage1_text, stage2_text, {
+            "prompt_tokens": original, "tokens_saved": 0, "condensed_rankings": False
+        }
+
+    stage2_text = render(stage2_results, "Ranking", [condense_ranking(r) for r in stage2_results])
+    headers = sum(estimate_tokens(f"Model: {r['model']}\nResponse: ") + 1 for r in stage1_results)
+    fitted, _ = fit_sections(responses, budget - estimate_tokens(stage2_text) - headers)
+    stage1_text = render(stage1_results, "Response", fitted)
+    prompt_tokens = estimate_tokens(stage1_text) + estimate_tokens(stage2_text)
+    return stage1_text, stage2_text, {
+        "prompt_tokens": prompt_tokens,
+        "tokens_saved": original - prompt_tokens,
+        "condensed_rankings": True,
+    }
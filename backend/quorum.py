@@ -0,0 +1,173 @@
+"""Quorum-based collection of parallel model responses."""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Tuple, Union
+
+from .openrouter import start_model_queries
+from .config import (
+    STAGE1_QUORUM, STAGE1_DEADLINE,
+    STAGE2_QUORUM, STAGE2_DEADLINE,
+    LATE_RESPONSE_POLICY,
+)
+
+
+@dataclass
+class QuorumPolicy:
+    """
+    When a stage may stop waiting for council members.
+
+    Attributes:
+        quorum: Number of successful answers to wait for (0 = all members)
+        deadline: Seconds after which the stage proceeds with whatever has
+            arrived, as long as at least one member answered
+        late: "drop" to cancel stragglers, "record" to keep them running
+    """
+    quorum: int = 0
+    deadline: float = 120.0
+    late: str = "record"
+
+
+STAGE1_POLICY = QuorumPolicy(STAGE1_QUORUM, STAGE1_DEADLINE, LATE_RESPONSE_POLICY)
+STAGE2_POLICY = QuorumPolicy(STAGE2_QUORUM, STAGE2_DEADLINE, LATE_RESPONSE_POLICY)
+
+
+@dataclass
+class QuorumOutcome:
+    """Result of a quorum-bounded collection."""
+    responses: Dict[str, Optional[Dict[str, Any]]]
+    reason: str
+    elapsed: float
+    expected: int
+    late_tasks: Dict[asyncio.Task, str] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact description for the run metadata."""
+        return {
+            "answered": sum(1 for r in self.responses.values() if r is not None),
+            "expected": self.expected,
+            "reason": self.reason,
+            "elapsed": round(self.elapsed, 2),
+            "pending": sorted(self.late_tasks.values()),
+        }
+
+    def collect_late(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Harvest stragglers that have finished by now and cancel the rest.
+
+        Returns:
+            List of (model, response) for late answers that succeeded
+        """
+        late = []
+        for task, model in self.late_tasks.items():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None and task.result() is not None:
+                late.append((model, task.result()))
+        self.late_tasks = {}
+        return late
+
+
+async def collect_with_quorum(
+    models: List[str],
+    messages: Union[List[Dict[str, str]], Dict[str, List[Dict[str, str]]]],
+    policy: QuorumPolicy,
+    on_delta: Optional[Callable[[str, str], None]] = None,
+    on_response: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    json_schema: Optional[Dict[str, Any]] = None,
+    json_schemas: Optional[Dict[str, Dict[str, Any]]] = None
+) -> QuorumOutcome:
+    """
+    Query models in parallel and return once the policy is satisfied.
+
+    Args:
+        models: Model identifiers to query
+        messages: Messages sent to every model, or a dict of per-model messages
+        policy: Quorum and deadline for this stage
+        on_delta: Forwarded to the streaming queries, called as on_delta(model, text)
+        on_response: Called as on_response(model, response) for each success in time
+        json_schema: If given, ask every model for JSON matching this schema
+        json_schemas: Per-model schemas, overriding json_schema
+
+    Returns:
+        QuorumOutcome with the in-time responses and any still-running tasks
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + policy.deadline
+    needed = min(policy.quorum or len(models), len(models))
+
+    tasks = start_model_queries(models, messages, on_delta, json_schema, json_schemas)
+    pending = set(tasks)
+    responses: Dict[str, Optional[Dict[str, Any]]] = {}
+    successes = 0
+    reason = "all"
+
+    try:
+        while pending:
+            if successes >= needed:
+                reason = "quorum"
+                break
+            remaining = deadline - loop.time()
+            if remaining <= 0 and successes > 0:
+                reason = "deadline"
+                break
+            # Past the deadline with nothing yet: keep waiting for the first answer
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=remaining if remaining > 0 else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                model = tasks[task]
+                response = task.result()
+                responses[model] = response
+                if response is not None:
+                    successes += 1
+                    if on_response:
+                        on_response(model, response)
+    except BaseException:
+        # Cancelled (e.g. the client disconnected): stop every member query
+        for task in tasks:
+            task.cancel()
+        raise
+
+    late_tasks = {task: tasks[task] for task in pending}
+    if policy.late == "drop":
+        for task in late_tasks:
+            task.cancel()
+        late_tasks = {}
+
+    return QuorumOutcome(
+        responses=responses,
+        reason=reason,
+        elapsed=loop.time() - started,
+        expected=len(models),
+        late_tasks=late_tasks,
+    )
+
+
+class StageTracker:
+    """Keeps the quorum outcome of each stage of one council run."""
+
+    def __init__(self):
+        self.outcomes: Dict[str, QuorumOutcome] = {}
+
+    def add(self, stage: str, outcome: QuorumOutcome):
+        """Remember a stage's outcome so its stragglers can be harvested later."""
+        self.outcomes[stage] = outcome
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage quorum summaries."""
+        return {stage: outcome.summary() for stage, outcome in self.outcomes.items()}
+
+    def harvest(self, stage: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Late answers of a stage that have finished; unfinished ones are cancelled."""
+        outcome = self.outcomes.get(stage)
+        return outcome.collect_late() if outcome else []
+
+    def cancel_all(self):
+        """Cancel every straggler still running."""
+        for outcome in self.outcomes.values():
+            for task in outcome.late_tasks:
+                task.cancel()
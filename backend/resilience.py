@@ -0,0 +1,157 @@
+"""Retry classification, jittered backoff and per-provider circuit breakers."""
+
+import asyncio
+import random
+import time
+from typing import Dict, Any, Optional
+
+import httpx
+
+from .config import (
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_COOLDOWN,
+)
+from .scheduler import AdmissionTimeout
+
+# Error classes returned by classify_error
+UNAVAILABLE = "unavailable"  # connect errors, timeouts, 5xx: retry and count against the breaker
+THROTTLED = "throttled"      # 429: retry, but the provider is up
+FATAL = "fatal"              # anything else (4xx, malformed responses): give up
+LOCAL = "local"              # our own budget ran out before sending: give up, provider not blamed
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Classify a provider call failure.
+
+    Args:
+        error: Exception raised by the provider call
+
+    Returns:
+        UNAVAILABLE, THROTTLED, FATAL or LOCAL
+    """
+    if isinstance(error, AdmissionTimeout):
+        return LOCAL
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            return THROTTLED
+        if status >= 500:
+            return UNAVAILABLE
+        return FATAL
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError,
+                          httpx.RemoteProtocolError, asyncio.TimeoutError)):
+        return UNAVAILABLE
+    return FATAL
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff.
+
+    Args:
+        attempt: Number of attempts made so far (1 after the first failure)
+
+    Returns:
+        Seconds to sleep before the next attempt
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after consecutive failures -> half-open after a cooldown.
+
+    While half-open a single probe request is let through; its success closes
+    the circuit and its failure re-opens it.
+    """
+
+    def __init__(self, provider: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown: float = CIRCUIT_COOLDOWN):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+        # Counters
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.retries = 0
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the probe slot when half-open)."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.short_circuited += 1
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self.probe_in_flight:
+                self.short_circuited += 1
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record_success(self):
+        """The provider answered: close the circuit."""
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        """The provider looked unavailable: open the circuit if over threshold."""
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """The outcome says nothing about availability: free the probe slot."""
+        self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Current state and counters."""
+        half_open_in: Optional[float] = None
+        if self.state == "open":
+            half_open_in = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retries": self.retries,
+            "half_open_in_seconds": half_open_in,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """
+    Get (or create) the circuit breaker for a provider.
+
+    Args:
+        provider: Provider name
+
+    Returns:
+        The provider's CircuitBreaker
+    """
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(provider)
+        _breakers[provider] = breaker
+    return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """State of every provider's circuit breaker."""
+    return {provider: breaker.stats() for provider, breaker in _breakers.items()}
@@ -0,0 +1,181 @@
+"""Content-addressed cache of provider responses (in-memory LRU + SQLite)."""
+
+import asyncio
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from .config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MEMORY_ENTRIES,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_OPT_OUT_MODELS,
+)
+
+
+def cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    params: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Canonical hash of a request.
+
+    Args:
+        model: Model identifier
+        messages: Chat messages
+        params: Generation parameters that change the answer
+
+    Returns:
+        Hex SHA-256 of the canonical JSON encoding
+    """
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache.
+
+    Lookups try the in-process LRU first, then the SQLite file; disk hits are
+    promoted into memory. Entries expire after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_PATH,
+        ttl: float = RESPONSE_CACHE_TTL,
+        memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+        opt_out_models: Optional[List[str]] = None
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.opt_out_models = set(opt_out_models if opt_out_models is not None else RESPONSE_CACHE_OPT_OUT_MODELS)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def enabled_for(self, model: str) -> bool:
+        """Whether responses of this model may be cached."""
+        return model not in self.opt_out_models
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, expires_at REAL)"
+            )
+            db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _disk_put(self, key: str, model: str, response: Dict[str, Any], expires_at: float):
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, expires_at) VALUES (?, ?, ?, ?)",
+                (key, model, json.dumps(response, ensure_ascii=False), expires_at),
+            )
+            db.commit()
+
+    def _remember(self, key: str, response: Dict[str, Any], expires_at: float):
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key from cache_key()
+
+        Returns:
+            A copy of the cached response dict, or None on a miss
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[1] >= now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(entry[0])
+            del self._memory[key]
+
+        entry = await asyncio.to_thread(self._disk_get, key)
+        if entry is not None and entry[1] >= now:
+            self._remember(key, *entry)
+            self.disk_hits += 1
+            return copy.deepcopy(entry[0])
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, model: str, response: Dict[str, Any]):
+        """
+        Store a successful response in both tiers.
+
+        Args:
+            key: Key from cache_key()
+            model: Model identifier (kept for inspection and purging)
+            response: Response dict from the provider
+        """
+        expires_at = time.time() + self.ttl
+        self._remember(key, copy.deepcopy(response), expires_at)
+        await asyncio.to_thread(self._disk_put, key, model, response, expires_at)
+        self.stores += 1
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "ttl_seconds": self.ttl,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,238 @@
+"""Per-provider request scheduling: concurrency caps, rate limits and 429 cooldowns."""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+import httpx
+
+from .config import (
+    PROVIDER_LIMITS,
+    DEFAULT_PROVIDER_LIMITS,
+    RATE_LIMIT_DEFAULT_COOLDOWN,
+)
+
+
+class AdmissionTimeout(Exception):
+    """
+    A request could not be sent before its deadline.
+
+    Raised for local reasons only (our concurrency cap, RPM/TPM buckets or a
+    429 cooldown kept it queued, or the caller's budget was already spent):
+    nothing reached the provider, so it says nothing about its health.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    The balance may go negative when a request turns out to cost more than was
+    reserved up front; later acquirers then wait for the debt to be repaid.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """
+        Wait until `amount` tokens are available and take them.
+
+        Requests larger than the bucket only wait for a full bucket so they
+        cannot block forever.
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: float):
+        """Charge (positive) or refund (negative) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Parse a Retry-After header into seconds.
+
+    Args:
+        response: HTTP response (usually a 429 or 503)
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class ProviderScheduler:
+    """Admission control for a single provider."""
+
+    def __init__(self, provider: str, max_in_flight: int, rpm: float, tpm: float):
+        self.provider = provider
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+
+        # Counters
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.started = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _note_rate_limited(self, response: httpx.Response):
+        """Pause the provider according to Retry-After."""
+        self.rate_limited += 1
+        delay = parse_retry_after(response)
+        if delay is None:
+            delay = RATE_LIMIT_DEFAULT_COOLDOWN
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+
+    async def _admit(self, estimated_tokens: int):
+        """Wait for cooldown, a free slot and rate budget (semaphore held on return)."""
+        while True:
+            remaining = self.cooldown_until - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        await self._semaphore.acquire()
+        try:
+            await self.requests_bucket.acquire(1)
+            await self.tokens_bucket.acquire(estimated_tokens)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def run(
+        self,
+        call: Callable[[float], Awaitable[Dict[str, Any]]],
+        estimated_tokens: int,
+        timeout: float
+    ) -> Dict[str, Any]:
+        """
+        Run a provider call once admitted.
+
+        A 429 response pauses the whole provider (honoring Retry-After) before
+        the error is re-raised, so a retry queues behind the cooldown.
+
+        Args:
+            call: Coroutine factory taking the remaining timeout in seconds
+            estimated_tokens: Tokens to reserve against the TPM budget
+            timeout: Overall budget for queueing plus the request itself
+
+        Returns:
+            The call's result
+
+        Raises:
+            AdmissionTimeout: If the request could not be sent within the timeout
+            httpx.HTTPStatusError: On error responses, including 429
+        """
+        if timeout <= 0:
+            raise AdmissionTimeout(f"{self.provider}: no time left to send the request")
+        queued_at = time.monotonic()
+        deadline = queued_at + timeout
+        self.queue_depth += 1
+        try:
+            await asyncio.wait_for(self._admit(estimated_tokens), timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionTimeout(f"{self.provider}: not admitted within {timeout:.1f}s") from None
+        finally:
+            self.queue_depth -= 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._semaphore.release()
+            self.requests_bucket.adjust(-1)
+            self.tokens_bucket.adjust(-estimated_tokens)
+            raise AdmissionTimeout(f"{self.provider}: admitted after the deadline")
+        waited = time.monotonic() - queued_at
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.started += 1
+        self.in_flight += 1
+
+        try:
+            result = await call(remaining)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                self._note_rate_limited(e.response)
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+        usage_tokens = (result or {}).get("usage_tokens")
+        if usage_tokens:
+            self.tokens_bucket.adjust(usage_tokens - estimated_tokens)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue-depth, wait-time and throttling counters."""
+        cooldown = max(0.0, self.cooldown_until - time.monotonic())
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "started": self.started,
+            "rate_limited": self.rate_limited,
+            "avg_wait_seconds": round(self.total_wait / self.started, 3) if self.started else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "cooldown_seconds": round(cooldown, 3),
+        }
+
+
+_schedulers: Dict[str, ProviderScheduler] = {}
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    """
+    Get (or create) the scheduler for a provider.
+
+    Args:
+        provider: Provider name
+
+    Returns:
+        The provider's ProviderScheduler
+    """
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        limits = {**DEFAULT_PROVIDER_LIMITS, **PROVIDER_LIMITS.get(provider, {})}
+        scheduler = ProviderScheduler(provider, **limits)
+        _schedulers[provider] = scheduler
+    return scheduler
+
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every provider that has been scheduled so far."""
+    return {provider: scheduler.stats() for provider, scheduler in _schedulers.items()}
@@ -0,0 +1,152 @@
+"""Local, dependency-free text similarity: normalization, shingles and MinHash."""
+
+import hashlib
+import random
+import re
+import unicodedata
+from array import array
+from typing import Iterable, List, Set
+
+# Punctuation is dropped, but arithmetic and comparison operators are kept:
+# "2+2" and "2-2" must not normalize to the same text
+_PUNCTUATION = re.compile(r"[^\w\s+\-*/=<>^%#]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+MINHASH_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures are persisted and must be comparable across processes
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for near-duplicate comparison.
+
+    NFKC-folds full-width characters, lowercases, strips punctuation other
+    than operators (+ - * / = < > ^ % #) and collapses whitespace.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        Normalized text
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def shingles(text: str, size: int = 2) -> Set[str]:
+    """
+    Character shingles of normalized text.
+
+    Character n-grams work for both CJK (no word boundaries) and
+    alphabetic languages.
+
+    Args:
+        text: Normalized text
+        size: Shingle length in characters
+
+    Returns:
+        Set of shingles (the whole text if it is shorter than `size`)
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def stable_hash64(feature: str) -> int:
+    """64-bit hash that is stable across processes (unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(features: Iterable[str]) -> array:
+    """
+    MinHash signature of a feature set.
+
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the sets.
+
+    Args:
+        features: Features such as shingles
+
+    Returns:
+        array("I") of MINHASH_PERMUTATIONS 32-bit values
+    """
+    hashes = [stable_hash64(feature) for feature in features]
+    signature = array("I", [_MAX_HASH] * MINHASH_PERMUTATIONS)
+    if not hashes:
+        return signature
+    for i, (a, b) in enumerate(_PERMUTATIONS):
+        signature[i] = min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+    return signature
+
+
+def signature_similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity from two MinHash signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two sets (1.0 for two empty sets)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def similarity_matrix(texts: List[str], size: int = 3) -> List[List[float]]:
+    """
+    Pairwise Jaccard similarity of the texts' shingle sets.
+
+    Exact rather than MinHash-estimated: there are only a handful of texts
+    and their sets are built once. An empty text (or None) is similar to
+    nothing, not even another empty text, so blank answers never count as
+    agreeing or as duplicates.
+
+    Args:
+        texts: Raw texts
+        size: Shingle length in characters
+
+    Returns:
+        Symmetric matrix with 1.0 on the diagonal
+    """
+    sets = [shingles(normalize_text(text or ""), size) for text in texts]
+    matrix = [[1.0] * len(sets) for _ in sets]
+    for i in range(len(sets)):
+        for j in range(i + 1, len(sets)):
+            similarity = jaccard(sets[i], sets[j]) if sets[i] and sets[j] else 0.0
+            matrix[i][j] = matrix[j][i] = similarity
+    return matrix
+
+
+def leader_clusters(matrix: List[List[float]], threshold: float) -> List[List[int]]:
+    """
+    Group items by similarity to a cluster leader.
+
+    Items are visited in order; each joins the first cluster whose leader
+    (first item) it is at least `threshold` similar to, or leads a new one.
+    Comparing with the leader only keeps clusters from drifting through
+    chains of slightly different items.
+
+    Args:
+        matrix: Pairwise similarities, e.g. from similarity_matrix
+        threshold: Minimum similarity to a leader
+
+    Returns:
+        Clusters as lists of indexes, leader first, in order of their leaders
+    """
+    clusters: List[List[int]] = []
+    for i in range(len(matrix)):
+        for cluster in clusters:
+            if matrix[cluster[0]][i] >= threshold:
+                cluster.append(i)
+                break
+        else:
+            clusters.append([i])
+    return clusters
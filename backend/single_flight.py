@@ -0,0 +1,123 @@
+"""Single-flight coalescing of identical in-flight council runs."""
+
+import asyncio
+import unicodedata
+from typing import Dict, Any, List, Set, Tuple, Callable, Awaitable
+
+from .council_cache import council_config_key
+
+
+def flight_key(user_query: str) -> Tuple[str, str]:
+    """
+    Requests coalesce when the question and council config match.
+
+    Only NFKC folding and outer whitespace are forgiven: the answer of a
+    shared run is saved into every joined conversation, so anything looser
+    ("2+2" vs "2-2" after stripping symbols) would save wrong answers.
+    """
+    return unicodedata.normalize("NFKC", user_query).strip(), council_config_key()
+
+
+class Flight:
+    """
+    One running council pipeline and its subscribers.
+
+    Every event is recorded so a subscriber that joins mid-run first receives
+    the events it missed, and all subscribers see the same stream.
+    """
+
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.task: asyncio.Task = None
+        self.events: List[Dict[str, Any]] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, event: Dict[str, Any]):
+        """Record an event and fan it out to every subscriber."""
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        """New subscriber queue, pre-filled with the events published so far."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self.subscribers.add(queue)
+        return queue
+
+
+class SingleFlight:
+    """
+    Registry of in-flight council runs keyed by flight_key().
+
+    Subscribers are reference counted: the run is cancelled only when the
+    last subscriber leaves before it has finished.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[str, str], Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def join(
+        self,
+        user_query: str,
+        run: Callable[[Callable[[Dict[str, Any]], None]], Awaitable[Any]]
+    ) -> Tuple[Flight, asyncio.Queue]:
+        """
+        Subscribe to the run for this question, starting it if none is in flight.
+
+        Args:
+            user_query: The user's question
+            run: Coroutine factory taking an event callback, e.g.
+                lambda on_event: run_full_council(user_query, on_event=on_event)
+
+        Returns:
+            Tuple of (flight, queue); read events from the queue until
+            flight.task is done, then call leave()
+        """
+        key = flight_key(user_query)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(key)
+            flight.task = asyncio.create_task(run(flight.publish))
+            flight.task.add_done_callback(lambda _: self._forget(flight))
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return flight, flight.subscribe()
+
+    def leave(self, flight: Flight, queue: asyncio.Queue):
+        """
+        Unsubscribe; cancels the run if this was its last subscriber.
+
+        Args:
+            flight: Flight returned by join()
+            queue: Queue returned by join()
+        """
+        flight.subscribers.discard(queue)
+        if not flight.subscribers and not flight.task.done():
+            self.cancelled += 1
+            flight.task.cancel()
+            self._forget(flight)
+
+    def _forget(self, flight: Flight):
+        # Finished runs leave the registry so later requests start afresh
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def stats(self) -> Dict[str, Any]:
+        """In-flight runs and coalescing counters."""
+        return {
+            "in_flight": len(self._flights),
+            "subscribers": sum(len(f.subscribers) for f in self._flights.values()),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
+
+
+council_flights = SingleFlight()
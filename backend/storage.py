@@ -1,21 +1,402 @@
-"""JSON-based storage for conversations."""
+"""Append-only JSONL storage for conversations.
+
+Each conversation is a log file `<id>.jsonl` with one JSON record per line:
+
+    {"type": "conversation", "id": ..., "created_at": ..., "title": ...}
+    {"type": "message", "message": {...}}
+    {"type": "title", "title": ...}
+
+A fork (see fork_conversation) shares its parent's history instead of copying
+it: its header names the parent and how many of the parent's messages it
+inherits, and its own log holds only the messages added after the fork.
+Messages are never rewritten, so the shared prefix is immutable; deleting a
+parent first gives each fork its own copy.
+
+Adding a message appends a single fsync'd line, so its cost does not depend on
+the history size. An in-memory offset index per conversation (byte offset of
+every message record, plus title and counts) is built by one scan and then
+kept up to date by the appends. Logs with many superseded records are
+compacted by an atomic rewrite. Legacy `<id>.json` files are migrated on first
+access.
+
+Listing metadata (id, created_at, title, message_count) is kept in a SQLite
+index next to the logs, updated by every write, so the sidebar never has to
+open the logs themselves.
+
+Writers hold an exclusive flock on `<id>.lock` and readers a shared one, so
+threads and other processes never interleave with a write or see a log
+half-way through compaction. A thread holding a conversation's lock only
+ever goes on to lock its forks, never its parent, so lock order follows the
+fork tree and cannot deadlock. Lock files are never removed, not even with
+their conversation: another process may be waiting on the old file, and
+unlinking it would let a third one lock a fresh file at the same time. These
+functions block; async code should use backend.async_storage.
+"""
 
 import json
 import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
-from .config import DATA_DIR
+from .config import DATA_DIR, CONVERSATION_COMPACT_THRESHOLD, CONVERSATION_INDEX_MAX_ENTRIES
+from .conversation_index import ConversationIndex
+from .conversation_cache import conversation_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process asyncio locks only
+    fcntl = None
+
+LOG_SUFFIX = ".jsonl"
+LEGACY_SUFFIX = ".json"
+LOCK_SUFFIX = ".lock"
+INDEX_FILENAME = "index.sqlite3"
+
+
+class _LogIndex:
+    """Offsets and metadata of one conversation log."""
+
+    def __init__(self, conversation_id: str):
+        self.id = conversation_id
+        self.created_at = None
+        self.title = "New Conversation"
+        self.parent = None  # conversation whose first `parent_messages` messages precede ours
+        self.parent_messages = 0
+        self.message_offsets: List[int] = []
+        self.superseded = 0  # records a compaction would drop
+        self.size = 0
+        self.stamp = None  # (inode, size, mtime) the index was built from
+
+    @property
+    def message_count(self) -> int:
+        return self.parent_messages + len(self.message_offsets)
+
+
+class _IndexCache:
+    """LRU of log indexes by conversation id; evicted ones are rebuilt by _scan."""
+
+    def __init__(self, max_entries: int = CONVERSATION_INDEX_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _LogIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str) -> Optional[_LogIndex]:
+        with self._lock:
+            index = self._entries.get(conversation_id)
+            if index is not None:
+                self._entries.move_to_end(conversation_id)
+            return index
+
+    def put(self, conversation_id: str, index: _LogIndex):
+        with self._lock:
+            self._entries[conversation_id] = index
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, conversation_id: str):
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_indexes = _IndexCache()
+_metadata: Optional[ConversationIndex] = None
+_migrated = False
+_migration_lock = threading.Lock()
+_metadata_lock = threading.RLock()
+_held = threading.local()  # conversation ids this thread holds a file lock on
 
 
 def ensure_data_dir():
-    """Ensure the data directory exists."""
+    """Ensure the data directory exists and legacy JSON files are migrated."""
+    global _migrated
     Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
+    if not _migrated:
+        with _migration_lock:
+            if not _migrated:
+                _migrated = True
+                migrate_json_conversations()
+
+
+@contextmanager
+def _file_lock(conversation_id: str, exclusive: bool = True):
+    """
+    Cross-process lock on one conversation (re-entrant within a thread).
+
+    Shared locks on a conversation that does not exist are skipped so that
+    lookups of unknown ids do not leave lock files behind.
+    """
+    held = getattr(_held, "ids", None)
+    if held is None:
+        held = _held.ids = set()
+    if fcntl is None or conversation_id in held:
+        yield
+        return
+    if not exclusive and not os.path.exists(get_conversation_path(conversation_id)):
+        yield
+        return
+
+    fd = os.open(os.path.join(DATA_DIR, f"{conversation_id}{LOCK_SUFFIX}"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        held.add(conversation_id)
+        try:
+            yield
+        finally:
+            held.discard(conversation_id)
+    finally:
+        os.close(fd)  # also releases the lock
+
+
+def metadata_index() -> ConversationIndex:
+    """
+    The listing index for DATA_DIR, rebuilt from the logs if it is new.
+
+    Returns:
+        The ConversationIndex
+    """
+    global _metadata
+    path = os.path.join(DATA_DIR, INDEX_FILENAME)
+    if _metadata is None or _metadata.path != path:
+        with _metadata_lock:
+            if _metadata is None or _metadata.path != path:
+                Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
+                index = ConversationIndex(path)
+                index.open()
+                _metadata = index
+                if index.created:
+                    index.created = False
+                    rebuild_metadata_index()
+    return _metadata
+
+
+def rebuild_metadata_index():
+    """Re-derive every listing row from the conversation logs."""
+    for filename in os.listdir(DATA_DIR):
+        if filename.endswith(LOG_SUFFIX):
+            conversation_id = filename[:-len(LOG_SUFFIX)]
+            with _file_lock(conversation_id, exclusive=False):
+                _scan(conversation_id)
 
 
 def get_conversation_path(conversation_id: str) -> str:
-    """Get the file path for a conversation."""
-    return os.path.join(DATA_DIR, f"{conversation_id}.json")
+    """Get the log file path for a conversation."""
+    return os.path.join(DATA_DIR, f"{conversation_id}{LOG_SUFFIX}")
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _stamp(stat: os.stat_result) -> tuple:
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _fsync_dir(path: str):
+    """Persist a rename or file creation in `path`'s directory."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _write_log(path: str, records: List[Dict[str, Any]]):
+    """Atomically replace a log with the given records (write, fsync, rename)."""
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _write_all(fd, b"".join(_encode(record) for record in records))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def _apply(index: _LogIndex, record: Dict[str, Any], offset: int):
+    """Update an index with a record found at `offset`."""
+    kind = record.get("type")
+    if kind == "message":
+        index.message_offsets.append(offset)
+    elif kind == "title":
+        index.title = record["title"]
+        index.superseded += 1
+    elif kind == "conversation":
+        index.created_at = record["created_at"]
+        index.title = record.get("title", index.title)
+        index.parent = record.get("parent")
+        index.parent_messages = record.get("parent_messages", 0)
+
+
+def _scan(conversation_id: str) -> Optional[_LogIndex]:
+    """
+    Build the index of a log by reading it once.
+
+    A torn last line (crash in the middle of an append) is cut off so the
+    next append starts on a clean record boundary.
+    """
+    path = get_conversation_path(conversation_id)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    index = _LogIndex(conversation_id)
+    offset = 0
+    while offset < len(data):
+        end = data.find(b"\n", offset)
+        if end == -1:
+            break
+        try:
+            record = json.loads(data[offset:end])
+        except ValueError:
+            break
+        _apply(index, record, offset)
+        offset = end + 1
+
+    if offset < len(data):
+        print(f"Truncating torn record in {path} at byte {offset}")
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+            os.fsync(f.fileno())
+
+    index.size = offset
+    index.stamp = _stamp(os.stat(path))
+    _indexes.put(conversation_id, index)
+
+    # A scan is authoritative; it also repairs a listing row that missed an
+    # update because of a crash between the log append and the index write
+    metadata_index().upsert(conversation_id, index.created_at, index.title, index.message_count)
+    if index.parent is not None:
+        metadata_index().add_fork(index.parent, conversation_id, index.parent_messages)
+    return index
+
+
+def _load_index(conversation_id: str) -> Optional[_LogIndex]:
+    """Cached index of a log, rebuilt if another writer changed the file."""
+    with _file_lock(conversation_id, exclusive=False):
+        return _load_index_locked(conversation_id)
+
+
+def _load_index_locked(conversation_id: str) -> Optional[_LogIndex]:
+    try:
+        stat = os.stat(get_conversation_path(conversation_id))
+    except FileNotFoundError:
+        _indexes.pop(conversation_id)
+        return None
+    index = _indexes.get(conversation_id)
+    if index is not None and index.stamp == _stamp(stat):
+        return index
+    return _scan(conversation_id)
+
+
+def _read_records(conversation_id: str, size: int) -> List[Dict[str, Any]]:
+    """The first `size` bytes of a log, parsed (caller holds the lock)."""
+    with open(get_conversation_path(conversation_id), "rb") as f:
+        data = f.read(size)
+    return [json.loads(line) for line in data.split(b"\n") if line]
+
+
+def _rewrite(
+    conversation_id: str,
+    records: List[Dict[str, Any]],
+    title: str,
+    inherited: Optional[List[Dict[str, Any]]] = None
+) -> _LogIndex:
+    """
+    Replace a log with its header and messages, dropping superseded records
+    (caller holds the exclusive lock). With `inherited`, the log stops
+    referencing its parent and stores those messages itself.
+    """
+    header = next((r for r in records if r.get("type") == "conversation"), None)
+    header = {**(header or {"type": "conversation", "id": conversation_id}), "title": title}
+    if inherited is not None:
+        header.pop("parent", None)
+        header.pop("parent_messages", None)
+    messages = [{"type": "message", "message": message} for message in inherited or []]
+    messages.extend(r for r in records if r.get("type") == "message")
+    _write_log(get_conversation_path(conversation_id), [header] + messages)
+    return _scan(conversation_id)
+
+
+def _append(conversation_id: str, *records: Dict[str, Any]) -> _LogIndex:
+    """
+    Durably append records to a conversation log.
+
+    All records go out in one write and one fsync, so appending a batch
+    costs about the same as appending a single message.
+
+    Args:
+        conversation_id: Conversation identifier
+        records: Records to append
+
+    Returns:
+        The updated index
+
+    Raises:
+        ValueError: If the conversation does not exist
+    """
+    ensure_data_dir()
+
+    with _file_lock(conversation_id):
+        return _append_locked(conversation_id, records)
+
+
+def _append_locked(conversation_id: str, records) -> _LogIndex:
+    index = _load_index(conversation_id)
+    if index is None:
+        raise ValueError(f"Conversation {conversation_id} not found")
+    if not records:
+        return index
+
+    lines = [_encode(record) for record in records]
+    old_stamp = index.stamp
+    fd = os.open(get_conversation_path(conversation_id), os.O_WRONLY | os.O_APPEND)
+    try:
+        _write_all(fd, b"".join(lines))
+        os.fsync(fd)
+        stamp = _stamp(os.fstat(fd))
+    finally:
+        os.close(fd)
+
+    new_messages = 0
+    title = None
+    for record, line in zip(records, lines):
+        _apply(index, record, index.size)
+        index.size += len(line)
+        conversation_cache.apply(conversation_id, record, len(line), old_stamp, stamp)
+        old_stamp = stamp
+        if record["type"] == "message":
+            new_messages += 1
+        elif record["type"] == "title":
+            title = record["title"]
+    index.stamp = stamp
+
+    if new_messages:
+        metadata_index().add_messages(conversation_id, new_messages)
+    if title is not None:
+        metadata_index().set_title(conversation_id, title)
+
+    if index.superseded >= CONVERSATION_COMPACT_THRESHOLD:
+        compact_conversation(conversation_id)
+    return index
 
 
 def create_conversation(conversation_id: str = None) -> Dict[str, Any]:
@@ -43,9 +424,7 @@ def create_conversation(conversation_id: str = None) -> Dict[str, Any]:
     }
 
     # Save to file
-    path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    save_conversation(conversation)
 
     return conversation
 
@@ -60,56 +439,258 @@ def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Conversation dict or None if not found
     """
-    path = get_conversation_path(conversation_id)
+    ensure_data_dir()
 
-    if not os.path.exists(path):
-        return None
+    missing_parent_stamp = None
+    while True:
+        with _file_lock(conversation_id, exclusive=False):
+            index = _load_index(conversation_id)
+            if index is None:
+                conversation_cache.invalidate(conversation_id)
+                return None
+            cached = conversation_cache.get(conversation_id, index.stamp)
+            if cached is not None:
+                return cached
+            records = _read_records(conversation_id, index.size)
+            size, stamp = index.size, index.stamp
+            parent, parent_messages = index.parent, index.parent_messages
+
+        conversation = {"id": conversation_id, "created_at": None, "title": "New Conversation", "messages": []}
+        for record in records:
+            kind = record.get("type")
+            if kind == "message":
+                conversation["messages"].append(record["message"])
+            elif kind == "title":
+                conversation["title"] = record["title"]
+            elif kind == "conversation":
+                conversation["created_at"] = record["created_at"]
+                conversation["title"] = record.get("title", conversation["title"])
+
+        if parent is not None:
+            # Read after releasing our lock (locks go parent -> fork only)
+            inherited = get_conversation(parent)
+            if inherited is None and missing_parent_stamp != stamp:
+                # The parent was deleted meanwhile, which detached this log first
+                missing_parent_stamp = stamp
+                continue
+            if inherited is None:
+                print(f"Parent {parent} of conversation {conversation_id} is missing")
+            else:
+                conversation["messages"] = inherited["messages"][:parent_messages] + conversation["messages"]
+
+        conversation_cache.put(conversation_id, conversation, size, stamp)
+        return conversation
+
+
+def get_messages(conversation_id: str, start: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read a slice of a conversation's messages without parsing the rest.
+
+    Args:
+        conversation_id: Conversation identifier
+        start: Index of the first message
+        limit: Maximum number of messages (all remaining if None)
+
+    Returns:
+        List of message dicts, or None if the conversation does not exist
+    """
+    ensure_data_dir()
 
-    with open(path, 'r') as f:
-        return json.load(f)
+    with _file_lock(conversation_id, exclusive=False):
+        index = _load_index(conversation_id)
+        if index is None:
+            return None
+        shared, parent = index.parent_messages, index.parent
+        stop = None if limit is None else start + limit
+        offsets = index.message_offsets[max(start - shared, 0):None if stop is None else max(stop - shared, 0)]
+
+        messages = []
+        if offsets:
+            with open(get_conversation_path(conversation_id), "rb") as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    messages.append(json.loads(f.readline())["message"])
+
+    if parent is not None and start < shared:
+        inherited = get_messages(parent, start, (shared if stop is None else min(shared, stop)) - start)
+        if inherited is None:
+            # Parent deleted meanwhile (this log was detached); read it again
+            conversation = get_conversation(conversation_id)
+            return None if conversation is None else conversation["messages"][start:stop]
+        messages = inherited + messages
+    return messages
 
 
 def save_conversation(conversation: Dict[str, Any]):
     """
-    Save a conversation to storage.
+    Save a whole conversation to storage, replacing its log atomically.
 
     Args:
         conversation: Conversation dict to save
     """
     ensure_data_dir()
 
-    path = get_conversation_path(conversation['id'])
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    records = [{
+        "type": "conversation",
+        "id": conversation["id"],
+        "created_at": conversation["created_at"],
+        "title": conversation.get("title", "New Conversation"),
+    }]
+    records.extend({"type": "message", "message": message} for message in conversation["messages"])
+    with _file_lock(conversation["id"]):
+        _write_log(get_conversation_path(conversation["id"]), records)
+        index = _scan(conversation["id"])
+        conversation_cache.put(conversation["id"], conversation, index.size, index.stamp)
 
 
-def list_conversations() -> List[Dict[str, Any]]:
+def compact_conversation(conversation_id: str):
     """
-    List all conversations (metadata only).
+    Rewrite a log without superseded records (old titles, torn tails).
+
+    A fork keeps referencing its parent; only its own records are rewritten.
+
+    Args:
+        conversation_id: Conversation identifier
+    """
+    with _file_lock(conversation_id):
+        index = _load_index(conversation_id)
+        if index is None:
+            return
+        cached = conversation_cache.get(conversation_id, index.stamp)
+        index = _rewrite(conversation_id, _read_records(conversation_id, index.size), index.title)
+        if cached is not None:
+            conversation_cache.put(conversation_id, cached, index.size, index.stamp)
+
+
+def fork_conversation(
+    conversation_id: str,
+    new_conversation_id: str = None,
+    title: str = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Create a copy of a conversation that shares the existing history.
+
+    Only a header is written, whatever the length of the conversation; new
+    messages are appended to the fork's own log.
+
+    Args:
+        conversation_id: Conversation to fork
+        new_conversation_id: Identifier for the fork (generated if None)
+        title: Title of the fork (the parent's title if None)
 
     Returns:
-        List of conversation metadata dicts
+        Metadata dict of the fork, or None if the conversation does not exist
     """
+    import uuid
+
     ensure_data_dir()
 
-    conversations = []
+    if new_conversation_id is None:
+        new_conversation_id = str(uuid.uuid4())
+
+    # Holding the parent's lock keeps a concurrent delete from missing the fork
+    with _file_lock(conversation_id, exclusive=False):
+        parent = _load_index(conversation_id)
+        if parent is None:
+            return None
+        header = {
+            "type": "conversation",
+            "id": new_conversation_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "title": title or parent.title,
+        }
+        if parent.message_count:
+            header["parent"] = conversation_id
+            header["parent_messages"] = parent.message_count
+        with _file_lock(new_conversation_id):
+            _write_log(get_conversation_path(new_conversation_id), [header])
+            index = _scan(new_conversation_id)
+
+    return {
+        "id": new_conversation_id,
+        "created_at": index.created_at,
+        "title": index.title,
+        "message_count": index.message_count,
+    }
+
+
+def _detach(conversation_id: str, parent_id: str, parent_messages: List[Dict[str, Any]]):
+    """Give a fork its own copy of the history it shares with `parent_id`."""
+    with _file_lock(conversation_id):
+        index = _load_index(conversation_id)
+        if index is None or index.parent != parent_id:
+            return
+        records = _read_records(conversation_id, index.size)
+        _rewrite(conversation_id, records, index.title, parent_messages[:index.parent_messages])
+        conversation_cache.invalidate(conversation_id)
+
+
+def migrate_json_conversations() -> int:
+    """
+    Convert legacy `<id>.json` conversation files to logs.
+
+    The original file is kept as `<id>.json.bak` once its log is durable.
+
+    Returns:
+        Number of conversations migrated
+    """
+    migrated = 0
     for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            path = os.path.join(DATA_DIR, filename)
-            with open(path, 'r') as f:
-                data = json.load(f)
-                # Return metadata only
-                conversations.append({
-                    "id": data["id"],
-                    "created_at": data["created_at"],
-                    "title": data.get("title", "New Conversation"),
-                    "message_count": len(data["messages"])
-                })
+        if not filename.endswith(LEGACY_SUFFIX):
+            continue
+        legacy_path = os.path.join(DATA_DIR, filename)
+        with open(legacy_path, 'r') as f:
+            conversation = json.load(f)
+        conversation.setdefault("messages", [])
+        save_conversation(conversation)
+        os.replace(legacy_path, f"{legacy_path}.bak")
+        migrated += 1
+    if migrated:
+        print(f"Migrated {migrated} conversations to append-only logs")
+    return migrated
+
+
+def list_conversations(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> List[Dict[str, Any]]:
+    """
+    List conversations (metadata only).
+
+    Args:
+        limit: Maximum number of conversations (all if None)
+        cursor: Cursor returned with the previous page
+        order: "desc" (newest first) or "asc" by creation time
+
+    Returns:
+        List of conversation metadata dicts
+    """
+    return list_conversations_page(limit, cursor, order)[0]
+
+
+def list_conversations_page(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order: str = "desc"
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of conversation metadata from the listing index.
 
-    # Sort by creation time, newest first
-    conversations.sort(key=lambda x: x["created_at"], reverse=True)
+    Args:
+        limit: Page size (all remaining conversations if None)
+        cursor: Cursor returned with the previous page
+        order: "desc" (newest first) or "asc" by creation time
+
+    Returns:
+        Tuple of (metadata dicts, cursor of the next page or None)
 
-    return conversations
+    Raises:
+        ValueError: On an unknown order or malformed cursor
+    """
+    ensure_data_dir()
+
+    return metadata_index().page(limit, cursor, order)
 
 
 def add_user_message(conversation_id: str, content: str):
@@ -120,17 +701,14 @@ def add_user_message(conversation_id: str, content: str):
         conversation_id: Conversation identifier
         content: User message content
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
-        "role": "user",
-        "content": content
+    _append(conversation_id, {
+        "type": "message",
+        "message": {
+            "role": "user",
+            "content": content
+        }
     })
 
-    save_conversation(conversation)
-
 
 def add_assistant_message(
     conversation_id: str,
@@ -147,19 +725,16 @@ def add_assistant_message(
         stage2: List of model rankings
         stage3: Final synthesized response
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
-        "role": "assistant",
-        "stage1": stage1,
-        "stage2": stage2,
-        "stage3": stage3
+    _append(conversation_id, {
+        "type": "message",
+        "message": {
+            "role": "assistant",
+            "stage1": stage1,
+            "stage2": stage2,
+            "stage3": stage3
+        }
     })
 
-    save_conversation(conversation)
-
 
 def update_conversation_title(conversation_id: str, title: str):
     """
@@ -169,24 +744,40 @@ def update_conversation_title(conversation_id: str, title: str):
         conversation_id: Conversation identifier
         title: New title for the conversation
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["title"] = title
-    save_conversation(conversation)
+    _append(conversation_id, {"type": "title", "title": title})
 
 
 def delete_conversation(conversation_id: str):
     """
     Delete a conversation and its file.
 
+    Forks of the conversation are detached first: they get their own copy of
+    the messages they shared with it.
+
     Args:
         conversation_id: Conversation identifier to delete
     """
+    ensure_data_dir()
+
     path = get_conversation_path(conversation_id)
-    if os.path.exists(path):
-        os.remove(path)
+    messages: List[Dict[str, Any]] = []
+    while True:
+        with _file_lock(conversation_id):
+            forks = metadata_index().forks(conversation_id)
+            shared = max((count for _, count in forks), default=0)
+            if shared <= len(messages) or not os.path.exists(path):
+                for child_id, _ in forks:
+                    _detach(child_id, conversation_id, messages)
+                if os.path.exists(path):
+                    os.remove(path)
+                _indexes.pop(conversation_id)
+                conversation_cache.invalidate(conversation_id)
+                metadata_index().delete(conversation_id)
+                return
+        # Our full history is needed to detach the forks. Read it without
+        # holding our lock, since it may come from our own parent.
+        conversation = get_conversation(conversation_id)
+        messages = conversation["messages"] if conversation is not None else []
 
 
 def add_message(
@@ -208,10 +799,6 @@ def add_message(
         stage2: Stage 2 data for assistant messages
         stage3: Stage 3 data for assistant messages
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
     message = {
         "role": role,
         "content": content
@@ -226,5 +813,20 @@ def add_message(
         if stage3 is not None:
             message["stage3"] = stage3
 
-    conversation["messages"].append(message)
-    save_conversation(conversation)
+    _append(conversation_id, {"type": "message", "message": message})
+
+
+def add_messages(conversation_id: str, messages: List[Dict[str, Any]]):
+    """
+    Append several messages at once (imports, copies, replays).
+
+    The batch is written with a single append and fsync.
+
+    Args:
+        conversation_id: Conversation identifier
+        messages: Message dicts as returned by get_conversation
+
+    Raises:
+        ValueError: If the conversation does not exist
+    """
+    _append(conversation_id, *({"type": "message", "message": message} for message in messages))
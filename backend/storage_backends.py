@@ -0,0 +1,346 @@
+"""Pluggable conversation storage: JSONL files, SQLite or PostgreSQL.
+
+Every backend exposes the same async API (the one backend.async_storage
+introduced), so request handlers do not care where conversations live. The
+backend is chosen with STORAGE_BACKEND.
+"""
+
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from . import async_storage
+from .config import STORAGE_BACKEND
+from .conversation_index import encode_cursor, decode_cursor
+
+
+class StorageBackend:
+    """Async conversation storage interface."""
+
+    name = "base"
+
+    async def start(self):
+        """Prepare the backend (create tables, open pools)."""
+
+    async def close(self):
+        """Release pools and worker threads."""
+
+    async def create_conversation(self, conversation_id: str = None) -> Dict[str, Any]:
+        """Create a new, empty conversation and return it."""
+        raise NotImplementedError
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Full conversation with messages, or None if not found."""
+        raise NotImplementedError
+
+    async def list_conversations_page(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        order: str = "desc"
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of conversation metadata, ordered by (created_at, id).
+
+        Every backend pages by the same key, so cursors and page order do not
+        change with STORAGE_BACKEND.
+
+        Returns:
+            Tuple of (metadata dicts, cursor of the next page or None)
+
+        Raises:
+            ValueError: On an unknown order or malformed cursor
+        """
+        raise NotImplementedError
+
+    async def add_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        stage1: List[Dict] = None,
+        stage2: List[Dict] = None,
+        stage3: Dict = None
+    ):
+        """
+        Append a message.
+
+        Raises:
+            ValueError: If the conversation does not exist
+        """
+        raise NotImplementedError
+
+    async def add_messages(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        """
+        Append several messages at once (imports, copies, replays).
+
+        Args:
+            conversation_id: Conversation identifier
+            messages: Message dicts in the shape get_conversation returns
+
+        Raises:
+            ValueError: If the conversation does not exist
+        """
+        for message in messages:
+            await self.add_message(
+                conversation_id,
+                message["role"],
+                message.get("content", ""),
+                message.get("stage1"),
+                message.get("stage2"),
+                message.get("stage3"),
+            )
+
+    async def fork_conversation(self, conversation_id: str, title: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Copy a conversation with all its messages.
+
+        Args:
+            conversation_id: Conversation to copy
+            title: Title of the copy (the original's title if None)
+
+        Returns:
+            Metadata dict of the copy, or None if the conversation does not exist
+        """
+        conversation = await self.get_conversation(conversation_id)
+        if conversation is None:
+            return None
+        title = title or conversation["title"]
+        copy = await self.create_conversation()
+        await self.update_conversation_title(copy["id"], title)
+        await self.add_messages(copy["id"], conversation["messages"])
+        return {
+            "id": copy["id"],
+            "created_at": copy["created_at"],
+            "title": title,
+            "message_count": len(conversation["messages"]),
+        }
+
+    async def update_conversation_title(self, conversation_id: str, title: str):
+        """Change a conversation's title."""
+        raise NotImplementedError
+
+    async def delete_conversation(self, conversation_id: str):
+        """Delete a conversation and its messages."""
+        raise NotImplementedError
+
+    async def add_user_message(self, conversation_id: str, content: str):
+        """Append a user message."""
+        await self.add_message(conversation_id, "user", content)
+
+    async def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        """Append an assistant message with all 3 stages."""
+        await self.add_message(conversation_id, "assistant", "", stage1, stage2, stage3)
+
+
+class FileStorageBackend(StorageBackend):
+    """Append-only JSONL logs in DATA_DIR (see backend.storage)."""
+
+    name = "file"
+
+    async def close(self):
+        async_storage.shutdown()
+
+    async def create_conversation(self, conversation_id: str = None) -> Dict[str, Any]:
+        return await async_storage.create_conversation(conversation_id)
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return await async_storage.get_conversation(conversation_id)
+
+    async def list_conversations_page(self, limit=None, cursor=None, order="desc"):
+        return await async_storage.list_conversations_page(limit, cursor, order)
+
+    async def add_message(self, conversation_id, role, content, stage1=None, stage2=None, stage3=None):
+        await async_storage.add_message(conversation_id, role, content, stage1, stage2, stage3)
+
+    async def add_messages(self, conversation_id, messages):
+        await async_storage.add_messages(conversation_id, messages)
+
+    async def fork_conversation(self, conversation_id, title=None):
+        # Copy-on-write: the fork references the existing log
+        return await async_storage.fork_conversation(conversation_id, title)
+
+    async def add_user_message(self, conversation_id: str, content: str):
+        await async_storage.add_user_message(conversation_id, content)
+
+    async def add_assistant_message(self, conversation_id, stage1, stage2, stage3):
+        await async_storage.add_assistant_message(conversation_id, stage1, stage2, stage3)
+
+    async def update_conversation_title(self, conversation_id: str, title: str):
+        await async_storage.update_conversation_title(conversation_id, title)
+
+    async def delete_conversation(self, conversation_id: str):
+        await async_storage.delete_conversation(conversation_id)
+
+
+def _message_to_dict(message) -> Dict[str, Any]:
+    """Message row -> the message dict shape the file store and frontend use."""
+    if message.role != "assistant":
+        return {"role": message.role, "content": message.content}
+    result = {"role": "assistant"}
+    if message.content:
+        result["content"] = message.content
+    if message.stage1_responses is not None:
+        result["stage1"] = message.stage1_responses
+    if message.stage2_rankings is not None:
+        result["stage2"] = message.stage2_rankings
+    if message.stage3_response is not None:
+        result["stage3"] = message.stage3_response
+    return result
+
+
+class SQLStorageBackend(StorageBackend):
+    """
+    Conversations in SQLite (WAL) or PostgreSQL via the async SQLAlchemy layer.
+
+    Each operation runs in its own short session, so a connection is only
+    borrowed from the pool for the duration of one unit of work. (Holding a
+    session for a whole request would pin a connection for the minutes a
+    streamed council run takes.) Drivers and engines are loaded lazily.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def start(self):
+        from .database import create_tables
+        await create_tables()
+
+    async def close(self):
+        from .database import dispose_engines
+        await dispose_engines()
+
+    def _session(self):
+        from .database import AsyncSessionLocal
+        return AsyncSessionLocal()
+
+    async def create_conversation(self, conversation_id: str = None) -> Dict[str, Any]:
+        from .db_service import ConversationService
+        async with self._session() as db:
+            conversation = await ConversationService.create_conversation(
+                db, title="New Conversation", conversation_id=conversation_id
+            )
+            return {
+                "id": conversation.id,
+                "created_at": conversation.created_at.isoformat(),
+                "title": conversation.title,
+                "messages": [],
+            }
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        from .db_service import ConversationService
+        async with self._session() as db:
+            conversation = await ConversationService.get_conversation(db, conversation_id)
+            if conversation is None:
+                return None
+            return {
+                "id": conversation.id,
+                "created_at": conversation.created_at.isoformat(),
+                "title": conversation.title,
+                "messages": [_message_to_dict(message) for message in conversation.messages],
+            }
+
+    async def list_conversations_page(self, limit=None, cursor=None, order="desc"):
+        from .db_service import ConversationService
+        after = None
+        if cursor:
+            created_at, conversation_id = decode_cursor(cursor)
+            try:
+                after = (datetime.fromisoformat(created_at), conversation_id)
+            except ValueError as e:
+                raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+        async with self._session() as db:
+            rows = await ConversationService.list_conversations(
+                db, limit=limit + 1 if limit else None, cursor=after, order=order
+            )
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+        return [
+            {
+                "id": row.id,
+                "created_at": row.created_at.isoformat(),
+                "title": row.title,
+                "message_count": row.message_count or 0,
+            }
+            for row in rows
+        ], next_cursor
+
+    async def add_message(self, conversation_id, role, content, stage1=None, stage2=None, stage3=None):
+        from .db_service import MessageService
+        async with self._session() as db:
+            await MessageService.create_message(
+                db,
+                conversation_id=conversation_id,
+                role=role,
+                content=content or "",
+                stage1_responses=stage1,
+                stage2_rankings=stage2,
+                stage3_response=stage3,
+            )
+
+    async def add_messages(self, conversation_id, messages):
+        from .db_service import MessageService
+        async with self._session() as db:
+            await MessageService.create_messages(db, conversation_id, [
+                {
+                    "role": message["role"],
+                    "content": message.get("content", ""),
+                    "stage1_responses": message.get("stage1"),
+                    "stage2_rankings": message.get("stage2"),
+                    "stage3_response": message.get("stage3"),
+                }
+                for message in messages
+            ])
+
+    async def fork_conversation(self, conversation_id, title=None):
+        from .db_service import ConversationService
+        async with self._session() as db:
+            conversation = await ConversationService.fork_conversation(db, conversation_id, title)
+            if conversation is None:
+                return None
+            return {
+                "id": conversation.id,
+                "created_at": conversation.created_at.isoformat(),
+                "title": conversation.title,
+                "message_count": conversation.message_count or 0,
+            }
+
+    async def update_conversation_title(self, conversation_id: str, title: str):
+        from .db_service import ConversationService
+        async with self._session() as db:
+            if await ConversationService.update_conversation_title(db, conversation_id, title) is None:
+                raise ValueError(f"Conversation {conversation_id} not found")
+
+    async def delete_conversation(self, conversation_id: str):
+        from .db_service import ConversationService
+        async with self._session() as db:
+            await ConversationService.delete_conversation(db, conversation_id)
+
+
+def create_storage_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """
+    Build the configured storage backend.
+
+    Args:
+        name: "file", "sqlite" or "postgres"
+
+    Returns:
+        A StorageBackend
+
+    Raises:
+        ValueError: On an unknown backend name
+    """
+    if name == "file":
+        return FileStorageBackend()
+    if name in ("sqlite", "postgres"):
+        return SQLStorageBackend(name)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name!r} (expected file, sqlite or postgres)")
@@ -0,0 +1,44 @@
+"""Fast local token estimation (no tokenizer download required)."""
+
+import re
+from typing import List, Dict
+
+# CJK ideographs, kana and hangul are roughly one token per character for the
+# tokenizers our providers use; everything else averages about four characters.
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+# Per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Estimate the prompt tokens of a chat message list.
+
+    Args:
+        messages: List of message dicts with 'role' and 'content'
+
+    Returns:
+        Approximate token count including per-message overhead
+    """
+    return sum(
+        estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
@@ -140,6 +140,41 @@ function App() {
             });
             break;
 
+          case 'stage1_delta':
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              const partial = [...(lastMsg.stage1 || [])];
+              const index = partial.findIndex((r) => r.model === event.model);
+              if (index === -1) {
+                partial.push({ model: event.model, response: event.delta });
+              } else {
+                partial[index] = {
+                  ...partial[index],
+                  response: partial[index].response + event.delta,
+                };
+              }
+              // Replace rather than mutate: appending is not idempotent
+              messages[messages.length - 1] = { ...lastMsg, stage1: partial };
+              return { ...prev, messages };
+            });
+            break;
+
+          case 'stage1_model_complete':
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              const partial = (lastMsg.stage1 || []).filter(
+                (r) => r.model !== event.data.model
+              );
+              messages[messages.length - 1] = {
+                ...lastMsg,
+                stage1: [...partial, event.data],
+              };
+              return { ...prev, messages };
+            });
+            break;
+
           case 'stage1_complete':
             setCurrentConversation((prev) => {
               const messages = [...prev.messages];
@@ -159,6 +194,19 @@ function App() {
             });
             break;
 
+          case 'stage2_model_complete':
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              messages[messages.length - 1] = {
+                ...lastMsg,
+                stage2: [...(lastMsg.stage2 || []), event.data],
+                metadata: { ...lastMsg.metadata, ...event.metadata },
+              };
+              return { ...prev, messages };
+            });
+            break;
+
           case 'stage2_complete':
             setCurrentConversation((prev) => {
               const messages = [...prev.messages];
@@ -170,6 +218,20 @@ function App() {
             });
             break;
 
+          case 'cached_answer':
+            // Answer to a near-duplicate earlier question, shown until the
+            // fresh council answer arrives
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              messages[messages.length - 1] = {
+                ...lastMsg,
+                cachedAnswer: { ...event.data, cachedFrom: event.metadata },
+              };
+              return { ...prev, messages };
+            });
+            break;
+
           case 'stage3_start':
             setCurrentConversation((prev) => {
               const messages = [...prev.messages];
@@ -179,6 +241,21 @@ function App() {
             });
             break;
 
+          case 'stage3_delta':
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              messages[messages.length - 1] = {
+                ...lastMsg,
+                stage3: {
+                  model: event.model,
+                  response: (lastMsg.stage3?.response || '') + event.delta,
+                },
+              };
+              return { ...prev, messages };
+            });
+            break;
+
           case 'stage3_complete':
             setCurrentConversation((prev) => {
               const messages = [...prev.messages];
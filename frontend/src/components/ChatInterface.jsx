@@ -72,6 +72,20 @@ export default function ChatInterface({
                 <div className="assistant-message">
                   <div className="message-label">AI智议院</div>
 
+                  {/* Earlier answer to a near-duplicate question, until the fresh one is done */}
+                  {msg.cachedAnswer && !msg.stage3 && (
+                    <div className="cached-answer">
+                      <div className="cached-answer-label">
+                        相似问题的历史答案（“{msg.cachedAnswer.cachedFrom?.query}”，
+                        相似度 {Math.round((msg.cachedAnswer.cachedFrom?.similarity || 0) * 100)}%），
+                        新的答案生成中...
+                      </div>
+                      <div className="markdown-content">
+                        <ReactMarkdown>{msg.cachedAnswer.response}</ReactMarkdown>
+                      </div>
+                    </div>
+                  )}
+
                   {/* Stage 1 */}
                   {msg.loading?.stage1 && (
                     <div className="stage-loading">
@@ -2,14 +2,22 @@ import { useState } from 'react';
 import ReactMarkdown from 'react-markdown';
 import './Stage2.css';
 
+// Short display name for a label's model, or models when near-duplicate
+// responses were merged under one label
+function modelShortName(model) {
+  return [].concat(model).map((name) => name.split('/')[1] || name).join(' + ');
+}
+
 function deAnonymizeText(text, labelToModel) {
   if (!labelToModel) return text;
 
   let result = text;
-  // Replace each "Response X" with the actual model name
+  // Replace each "Response X" (or "回答X") with the actual model name; the
+  // lookahead keeps "Response A" from matching inside "Response AB"
   Object.entries(labelToModel).forEach(([label, model]) => {
-    const modelShortName = model.split('/')[1] || model;
-    result = result.replace(new RegExp(label, 'g'), `**${modelShortName}**`);
+    const letters = label.replace('Response ', '');
+    const pattern = new RegExp(`(?:Response |回答)${letters}(?![A-Za-z])`, 'g');
+    result = result.replace(pattern, `**${modelShortName(model)}**`);
   });
   return result;
 }
@@ -61,7 +69,7 @@ export default function Stage2({ rankings, labelToModel, aggregateRankings }) {
               {rankings[activeTab].parsed_ranking.map((label, i) => (
                 <li key={i}>
                   {labelToModel && labelToModel[label]
-                    ? labelToModel[label].split('/')[1] || labelToModel[label]
+                    ? modelShortName(labelToModel[label])
                     : label}
                 </li>
               ))}
@@ -74,7 +82,8 @@ export default function Stage2({ rankings, labelToModel, aggregateRankings }) {
         <div className="aggregate-rankings">
           <h4>综合排名结果</h4>
           <p className="stage-description">
-            所有模型评审的综合结果（分数越低越好）：
+            所有模型评审的综合结果，按 Bradley-Terry 强度排序（越高越好，即在两两比较中胜出的概率权重），
+            并附平均名次供参考：
           </p>
           <div className="aggregate-list">
             {aggregateRankings.map((agg, index) => (
@@ -84,7 +93,10 @@ export default function Stage2({ rankings, labelToModel, aggregateRankings }) {
                   {agg.model.split('/')[1] || agg.model}
                 </span>
                 <span className="rank-score">
-                  平均分: {agg.average_rank.toFixed(2)}
+                  强度: {(agg.bradley_terry * 100).toFixed(1)}%
+                </span>
+                <span className="rank-average">
+                  平均名次: {agg.average_rank != null ? agg.average_rank.toFixed(2) : '—'}
                 </span>
                 <span className="rank-count">
                   ({agg.rankings_count} 票)
@@ -0,0 +1,17 @@
+"""Shared fixtures."""
+
+import pytest
+
+from backend import storage
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the JSONL storage at a fresh directory."""
+    monkeypatch.setattr(storage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "_indexes", storage._IndexCache())
+    monkeypatch.setattr(storage, "_migrated", False)
+    yield tmp_path
+    if storage._metadata is not None:
+        storage._metadata.close()
+        storage._metadata = None
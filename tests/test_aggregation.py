@@ -0,0 +1,172 @@
+"""Tests for stage-2 rank aggregation."""
+
+import numpy as np
+import pytest
+
+from backend.aggregation import (
+    Merged, aggregate, rank_matrix, pairwise_counts, stage2_ballots,
+    borda_scores, copeland_scores, schulze_scores, bradley_terry,
+)
+from backend.council import history_ballots
+
+
+CANDIDATES = ["a", "b", "c"]
+
+# a>b 2-1, a>c 3-0, b>c 2-1: a is the Condorcet winner
+SIMPLE = [["a", "b", "c"], ["a", "c", "b"], ["b", "a", "c"]]
+
+# a>b 5-2, b>c 5-2, c>a 4-3: a Condorcet cycle
+CYCLE = [["a", "b", "c"]] * 3 + [["b", "c", "a"]] * 2 + [["c", "a", "b"]] * 2
+
+
+def _counts(ballots):
+    return pairwise_counts(rank_matrix(ballots, CANDIDATES))
+
+
+def _by_model(results):
+    return {entry["model"]: entry for entry in results}
+
+
+def test_pairwise_counts():
+    wins, ties = _counts(SIMPLE)
+    assert wins.tolist() == [[0, 2, 3], [1, 0, 2], [0, 1, 0]]
+    assert not ties.any()
+
+
+def test_borda():
+    wins, ties = _counts(SIMPLE)
+    assert borda_scores(wins, ties).tolist() == [5, 3, 1]
+
+
+def test_borda_with_ties():
+    wins, ties = _counts([[["a", "b"], "c"]])
+    assert ties.tolist() == [[0, 1, 0], [1, 0, 0], [0, 0, 0]]
+    assert borda_scores(wins, ties).tolist() == [1.5, 1.5, 0]
+
+
+def test_copeland():
+    wins, _ = _counts(SIMPLE)
+    assert copeland_scores(wins).tolist() == [2, 1, 0]
+
+
+def test_copeland_draws_count_half():
+    wins, _ = _counts([["a", "b", "c"], ["b", "a", "c"]])
+    assert copeland_scores(wins).tolist() == [1.5, 1.5, 0]
+
+
+def test_copeland_and_schulze_on_a_cycle():
+    wins, _ = _counts(CYCLE)
+    assert wins[0, 1] == 5 and wins[1, 2] == 5 and wins[2, 0] == 4
+    # Every candidate wins one majority...
+    assert copeland_scores(wins).tolist() == [1, 1, 1]
+    # ...but the strongest paths are a->b 5, a->c 5, b->c 5 against
+    # b->a 4, c->a 4, c->b 4, so Schulze breaks the cycle a > b > c
+    assert schulze_scores(wins).tolist() == [2, 1, 0]
+
+
+def test_schulze_agrees_with_condorcet_winner():
+    wins, _ = _counts(SIMPLE)
+    assert schulze_scores(wins).tolist() == [2, 1, 0]
+
+
+def test_bradley_terry_two_candidates():
+    # a beat b 3 times out of 4: without a prior P(a beats b) = s_a / (s_a + s_b) = 3/4
+    wins = np.array([[0.0, 3.0], [1.0, 0.0]])
+    ties = np.zeros((2, 2))
+    assert bradley_terry(wins, ties, prior=0).tolist() == pytest.approx([0.75, 0.25])
+    # The default prior adds half a virtual tie: (3 + 0.25) / (4 + 0.5)
+    assert bradley_terry(wins, ties)[0] == pytest.approx(3.25 / 4.5)
+
+
+def test_bradley_terry_ties_count_half_each_way():
+    wins = np.zeros((2, 2))
+    ties = np.array([[0.0, 2.0], [2.0, 0.0]])
+    assert bradley_terry(wins, ties, prior=0).tolist() == pytest.approx([0.5, 0.5])
+
+
+def test_bradley_terry_order_and_normalization():
+    wins, ties = _counts(SIMPLE)
+    strength = bradley_terry(wins, ties)
+    assert strength.sum() == pytest.approx(1)
+    assert strength[0] > strength[1] > strength[2]
+
+
+def test_single_candidate():
+    assert bradley_terry(np.zeros((1, 1)), np.zeros((1, 1))).tolist() == [1.0]
+    assert bradley_terry(np.zeros((0, 0)), np.zeros((0, 0))).tolist() == []
+    assert aggregate([["a"], ["a"]]) == [{
+        "model": "a", "average_rank": 1.0, "rankings_count": 2,
+        "borda": 0.0, "copeland": 0.0, "schulze": 0.0, "bradley_terry": 1.0,
+    }]
+    assert aggregate([]) == []
+
+
+def test_aggregate_scores_unranked_candidates():
+    results = _by_model(aggregate(SIMPLE[:1], candidates=["a", "b", "c", "d"]))
+    assert results["d"]["average_rank"] is None
+    assert results["d"]["rankings_count"] == 0
+    assert [entry["model"] for entry in aggregate(SIMPLE)] == ["a", "b", "c"]
+
+
+def test_merged_group_ranked_first_shares_one_position():
+    results = _by_model(aggregate([[Merged(("a", "b")), "c"]]))
+
+    assert results["a"]["average_rank"] == 1
+    assert results["b"]["average_rank"] == 1
+    assert results["c"]["average_rank"] == 2
+    # Each member beat c once; the members were never compared with each other
+    assert results["a"]["borda"] == results["b"]["borda"] == 1
+    assert results["c"]["borda"] == 0
+    assert results["a"]["bradley_terry"] == results["b"]["bradley_terry"]
+    assert results["c"]["bradley_terry"] < results["a"]["bradley_terry"]
+
+
+def test_merged_differs_from_a_tie():
+    merged = rank_matrix([[Merged(("a", "b")), "c"]], ["a", "b", "c"])
+    tied = rank_matrix([[["a", "b"], "c"]], ["a", "b", "c"])
+    assert merged.tolist() == [[1, 1, 2]]
+    assert tied.tolist() == [[1.5, 1.5, 3]]
+
+
+def test_merged_with_partial_ballot():
+    # The second judge saw a and c only. Beating the merged answer {a, b}
+    # counts once, split between its members, so c's win over a on the
+    # second ballot is worth a full game and its loss on the first half each.
+    results = _by_model(aggregate([[Merged(("a", "b")), "c"], ["c", "a"]]))
+
+    assert results["a"]["average_rank"] == 1.5
+    assert results["a"]["rankings_count"] == 2
+    assert results["b"]["average_rank"] == 1
+    assert results["b"]["rankings_count"] == 1
+    assert results["c"]["average_rank"] == 1.5
+    assert results["a"]["borda"] == 1
+    assert results["b"]["borda"] == 1
+    assert results["c"]["borda"] == 0.75
+
+
+def test_stage2_ballots_map_labels():
+    label_to_model = {"Response A": "m1", "Response B": ["m2", "m3"]}
+    stage2 = [
+        {"parsed_ranking": ["Response B", "Response A"]},
+        {"parsed_ranking": ["回答A", "Response Z"]},
+        {"parsed_ranking": None},
+    ]
+    ballots = stage2_ballots(stage2, label_to_model)
+    assert ballots == [[Merged(("m2", "m3")), "m1"], ["m1"], []]
+    assert isinstance(ballots[0][0], Merged)
+
+
+def test_history_ballots_rebuild_labels_from_stage1():
+    messages = [
+        {"role": "user", "content": "q"},
+        {
+            "role": "assistant",
+            "stage1": [
+                {"model": "m1", "response": "x"},
+                {"model": "m2", "response": "y"},
+                {"model": "m3", "response": "y", "duplicate_of": "m2"},
+            ],
+            "stage2": [{"parsed_ranking": ["Response B", "Response A"]}],
+        },
+    ]
+    assert history_ballots(messages) == [[Merged(("m2", "m3")), "m1"]]
@@ -0,0 +1,63 @@
+"""Tests for the near-duplicate council result cache."""
+
+import asyncio
+
+import pytest
+
+from backend.council_cache import CouncilCache
+
+STORED = [
+    "How do I sort a list of numbers in ascending order in Python?",
+    "What are the main advantages of React for building large single page applications?",
+    "Is Python faster than Java for numerical workloads?",
+    "Should I use a mutex here?",
+    "What is 2+2?",
+]
+
+
+def _lookup(tmp_path, query, min_similarity):
+    async def run():
+        cache = CouncilCache(path=str(tmp_path / "council.sqlite3"), min_similarity=min_similarity)
+        for stored in STORED:
+            await cache.store(stored, [], [], {"response": stored}, {}, config="c")
+        match = await cache.lookup(query, config="c")
+        cache.close()
+        return match
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("query", [
+    "How do I sort a list of numbers in descending order in Python?",
+    "What are the main advantages of Vue for building large single page applications?",
+    "Is Java faster than Python for numerical workloads?",
+    "Should I not use a mutex here?",
+    "What is 3+3?",
+    "What is 2-2?",
+])
+def test_one_word_differences_miss(tmp_path, query):
+    # Even with a permissive threshold, a differing content term is never a hit
+    assert _lookup(tmp_path, query, min_similarity=0.3) is None
+
+
+@pytest.mark.parametrize("query, stored", [
+    ("how do i sort a list of numbers in ascending order in python", STORED[0]),
+    ("Please, what are the main advantages of React for building large single page applications", STORED[1]),
+    ("what is 2+2", STORED[4]),
+])
+def test_rephrasings_hit(tmp_path, query, stored):
+    match = _lookup(tmp_path, query, min_similarity=0.8)
+    assert match is not None
+    assert match["query"] == stored
+    assert match["stage3"] == {"response": stored}
+
+
+def test_other_config_never_matches(tmp_path):
+    async def run():
+        cache = CouncilCache(path=str(tmp_path / "council.sqlite3"), min_similarity=0.8)
+        await cache.store(STORED[0], [], [], {}, {}, config="a")
+        match = await cache.lookup(STORED[0], config="b")
+        cache.close()
+        return match
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,70 @@
+"""Tests for sparse stage-2 judge assignments."""
+
+from collections import Counter
+
+import pytest
+
+from backend.council import judge_assignments, response_label
+
+
+def _labels(n):
+    return [response_label(i) for i in range(n)]
+
+
+def _connected(assignments, labels):
+    # Responses ranked by the same judge are compared, so they are linked
+    parent = {label: label for label in labels}
+
+    def find(label):
+        while parent[label] != label:
+            label = parent[label]
+        return label
+
+    for assigned in assignments.values():
+        for label in assigned[1:]:
+            parent[find(label)] = find(assigned[0])
+    return len({find(label) for label in labels}) == 1
+
+
+def test_response_labels():
+    assert [response_label(i) for i in (0, 1, 25, 26, 27, 701, 702)] == ["A", "B", "Z", "AA", "AB", "ZZ", "AAA"]
+
+
+@pytest.mark.parametrize("subset", [0, 5, 9])
+def test_full_assignment(subset):
+    labels = _labels(5)
+    assert judge_assignments(["j1", "j2"], labels, subset) == {"j1": labels, "j2": labels}
+
+
+def test_no_judges():
+    assert judge_assignments([], _labels(5), 2) == {}
+
+
+@pytest.mark.parametrize("n", range(2, 13))
+@pytest.mark.parametrize("m", range(1, 9))
+@pytest.mark.parametrize("subset", [1, 2, 3, 4])
+def test_sparse_coverage_balance_and_connectivity(n, m, subset):
+    labels = _labels(n)
+    judges = [f"j{j}" for j in range(m)]
+    assignments = judge_assignments(judges, labels, subset)
+    if subset >= n:
+        assert all(assigned == labels for assigned in assignments.values())
+        return
+
+    k = min(max(subset, 2, -(-n // m) + 1), n)
+    for assigned in assignments.values():
+        assert len(assigned) == k
+        assert assigned == sorted(assigned, key=labels.index)
+
+    reviews = Counter(label for assigned in assignments.values() for label in assigned)
+    assert set(reviews) == set(labels)
+    assert set(reviews.values()) <= {m * k // n, -(-m * k // n)}
+    assert _connected(assignments, labels)
+
+
+def test_documented_skew():
+    # n=7, m=4, k=3: E and G are reviewed once, the rest twice
+    assignments = judge_assignments(["j1", "j2", "j3", "j4"], _labels(7), 3)
+    reviews = Counter(label for assigned in assignments.values() for label in assigned)
+    assert {label for label, count in reviews.items() if count == 1} == {"E", "G"}
+    assert assignments == {"j1": ["A", "B", "C"], "j2": ["B", "C", "D"], "j3": ["D", "E", "F"], "j4": ["A", "F", "G"]}
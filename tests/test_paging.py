@@ -0,0 +1,47 @@
+"""Conversation listing pages the same way on every storage backend."""
+
+import asyncio
+
+import pytest
+
+from backend.conversation_index import encode_cursor, decode_cursor
+from backend.storage_backends import create_storage_backend
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-01T00:00:00", "abc")
+    assert decode_cursor(cursor) == ("2024-01-01T00:00:00", "abc")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def backend(request, data_dir, monkeypatch):
+    if request.param == "sqlite":
+        pytest.importorskip("aiosqlite")
+        from backend import database
+        monkeypatch.setattr(database, "ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{data_dir}/council.sqlite3")
+    return create_storage_backend(request.param)
+
+
+def test_pages_by_creation_time(backend):
+    async def run():
+        await backend.start()
+        try:
+            for n in range(3):
+                await backend.create_conversation(f"c{n}")
+                await asyncio.sleep(0.002)
+            # Activity on the oldest conversation must not move it in the listing
+            await backend.add_message("c0", "user", "bump")
+
+            pages = {}
+            for order in ("desc", "asc"):
+                first, cursor = await backend.list_conversations_page(2, None, order)
+                second, last = await backend.list_conversations_page(2, cursor, order)
+                assert last is None
+                pages[order] = [c["id"] for c in first + second]
+            return pages
+        finally:
+            await backend.close()
+
+    assert asyncio.run(run()) == {"desc": ["c2", "c1", "c0"], "asc": ["c0", "c1", "c2"]}
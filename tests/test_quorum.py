@@ -0,0 +1,91 @@
+"""Tests for quorum- and deadline-bounded collection."""
+
+import asyncio
+
+import pytest
+
+from backend import quorum
+from backend.quorum import QuorumPolicy, collect_with_quorum
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Fake council: model -> (delay in seconds, response or None)."""
+    script = {}
+
+    def start_model_queries(models, messages, on_delta=None, json_schema=None, json_schemas=None):
+        async def reply(model):
+            delay, response = script[model]
+            await asyncio.sleep(delay)
+            return response
+
+        return {asyncio.create_task(reply(model)): model for model in models}
+
+    monkeypatch.setattr(quorum, "start_model_queries", start_model_queries)
+    return script
+
+
+def _collect(models, policy):
+    async def run():
+        outcome = await collect_with_quorum(models, [], policy)
+        pending = dict(outcome.late_tasks)
+        await asyncio.sleep(0.15)
+        late = outcome.collect_late()
+        return outcome, pending, late
+
+    return asyncio.run(run())
+
+
+def test_waits_for_everyone_by_default(replies):
+    replies.update({"a": (0.01, {"content": "a"}), "b": (0.03, {"content": "b"})})
+    outcome, pending, _ = _collect(["a", "b"], QuorumPolicy(deadline=5))
+    assert outcome.reason == "all"
+    assert set(outcome.responses) == {"a", "b"}
+    assert not pending
+
+
+def test_quorum_stops_early_and_keeps_stragglers(replies):
+    replies.update({
+        "a": (0.01, {"content": "a"}), "b": (0.02, {"content": "b"}), "c": (0.1, {"content": "c"}),
+    })
+    outcome, pending, late = _collect(["a", "b", "c"], QuorumPolicy(quorum=2, deadline=5, late="record"))
+    assert outcome.reason == "quorum"
+    assert set(outcome.responses) == {"a", "b"}
+    assert sorted(pending.values()) == ["c"]
+    assert late == [("c", {"content": "c"})]
+
+
+def test_failures_do_not_count_towards_quorum(replies):
+    replies.update({
+        "a": (0.01, None), "b": (0.02, {"content": "b"}), "c": (0.03, {"content": "c"}), "d": (1.0, None),
+    })
+    outcome, pending, _ = _collect(["a", "b", "c", "d"], QuorumPolicy(quorum=2, deadline=5))
+    assert outcome.reason == "quorum"
+    assert outcome.responses == {"a": None, "b": {"content": "b"}, "c": {"content": "c"}}
+    assert sorted(pending.values()) == ["d"]
+
+
+def test_deadline_proceeds_with_what_arrived(replies):
+    replies.update({"a": (0.01, {"content": "a"}), "b": (1.0, {"content": "b"})})
+    outcome, pending, late = _collect(["a", "b"], QuorumPolicy(deadline=0.05, late="record"))
+    assert outcome.reason == "deadline"
+    assert 0.05 <= outcome.elapsed < 0.5
+    assert set(outcome.responses) == {"a"}
+    assert sorted(pending.values()) == ["b"]
+    assert late == []  # still running when harvested, so cancelled
+    assert all(task.cancelled() for task in pending)
+
+
+def test_deadline_with_drop_cancels_stragglers(replies):
+    replies.update({"a": (0.01, {"content": "a"}), "b": (1.0, {"content": "b"})})
+    outcome, pending, _ = _collect(["a", "b"], QuorumPolicy(deadline=0.05, late="drop"))
+    assert outcome.reason == "deadline"
+    assert not pending
+
+
+def test_past_deadline_waits_for_first_answer(replies):
+    replies.update({"a": (0.08, {"content": "a"}), "b": (1.0, {"content": "b"})})
+    outcome, _, _ = _collect(["a", "b"], QuorumPolicy(deadline=0.01, late="drop"))
+    assert outcome.reason == "deadline"
+    assert set(outcome.responses) == {"a"}
+    assert outcome.elapsed >= 0.08
@@ -0,0 +1,65 @@
+"""Tests for parsing stage-2 rankings."""
+
+import pytest
+
+from backend.council import parse_ranking, parse_ranking_from_text, ranking_schema
+
+VALID = {"Response A", "Response B", "Response C"}
+
+
+def test_json_answer():
+    text = '```json\n{"ranking": ["Response C", "A", "回答B"], "rationale": " C is most complete. "}\n```'
+    assert parse_ranking(text) == (["Response C", "Response A", "Response B"], "C is most complete.")
+
+
+def test_json_answer_drops_unknown_and_repeated_labels():
+    text = '{"ranking": ["Response B", "Response Z", "Response B", 3, "Response A"], "rationale": ""}'
+    assert parse_ranking(text, VALID) == (["Response B", "Response A"], "")
+
+
+def test_json_without_ranking_falls_back_to_text():
+    text = 'Example: {"note": 1}\nFINAL RANKING:\n1. Response B\n2. Response A'
+    assert parse_ranking(text) == (["Response B", "Response A"], None)
+
+
+def test_text_numbered_list_after_marker():
+    text = (
+        "Response A is thorough, Response C is wrong.\n\n"
+        "FINAL RANKING:\n1. Response A\n2. Response C\n3. Response B\n"
+    )
+    assert parse_ranking(text) == (["Response A", "Response C", "Response B"], None)
+
+
+def test_text_chinese_marker_and_labels():
+    text = "回答B最好。\n\n最终排名：\n1. 回答B\n2、回答A\n3) 回答C"
+    assert parse_ranking_from_text(text) == ["Response B", "Response A", "Response C"]
+
+
+def test_text_numbered_list_wins_over_mentions():
+    text = "FINAL RANKING:\nResponse C edges out the rest.\n1. Response B\n2. Response C\n3. Response A"
+    assert parse_ranking_from_text(text) == ["Response B", "Response C", "Response A"]
+
+
+def test_text_last_marker_counts():
+    text = "FINAL RANKING:\n1. Response A\n\nOn reflection:\nFINAL RANKING:\n1. Response B\n2. Response A"
+    assert parse_ranking_from_text(text) == ["Response B", "Response A"]
+
+
+def test_text_marker_without_labels_uses_whole_text():
+    text = "Response B beats Response A.\nFINAL RANKING:\n(see above)"
+    assert parse_ranking_from_text(text) == ["Response B", "Response A"]
+
+
+def test_text_filters_invalid_labels():
+    assert parse_ranking("FINAL RANKING:\n1. Response D\n2. Response A", VALID) == (["Response A"], None)
+
+
+@pytest.mark.parametrize("text", ["", "No ranking here.", "{not json"])
+def test_nothing_to_parse(text):
+    assert parse_ranking_from_text(text) == []
+
+
+def test_ranking_schema_enumerates_labels():
+    schema = ranking_schema(["Response A", "Response B"])
+    assert schema["properties"]["ranking"]["items"]["enum"] == ["Response A", "Response B"]
+    assert schema["required"] == ["ranking", "rationale"]
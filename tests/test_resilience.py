@@ -0,0 +1,165 @@
+"""Tests for error classification, circuit breakers and admission timeouts."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from backend import openrouter
+from backend.resilience import (
+    CircuitBreaker, classify_error, UNAVAILABLE, THROTTLED, FATAL, LOCAL,
+)
+from backend.scheduler import AdmissionTimeout, ProviderScheduler
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://example.invalid")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+@pytest.mark.parametrize("error, kind", [
+    (_status_error(429), THROTTLED),
+    (_status_error(503), UNAVAILABLE),
+    (_status_error(400), FATAL),
+    (httpx.ConnectError("refused"), UNAVAILABLE),
+    (asyncio.TimeoutError(), UNAVAILABLE),
+    (AdmissionTimeout("queued too long"), LOCAL),
+    (ValueError("bad json"), FATAL),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("p", failure_threshold=2, cooldown=60)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker("p", failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_single_probe():
+    breaker = CircuitBreaker("p", failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # probe already in flight
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker("p", failure_threshold=3, cooldown=0)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_breaker_release_frees_probe():
+    breaker = CircuitBreaker("p", failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_scheduler_admission_timeout():
+    async def run():
+        scheduler = ProviderScheduler("p", max_in_flight=1, rpm=600, tpm=100000)
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow(remaining):
+            started.set()
+            await release.wait()
+            return {}
+
+        holder = asyncio.create_task(scheduler.run(slow, 0, 5))
+        await started.wait()
+        with pytest.raises(AdmissionTimeout):
+            await scheduler.run(slow, 0, 0.05)
+        release.set()
+        await holder
+        assert scheduler.stats()["queue_depth"] == 0
+
+    asyncio.run(run())
+
+
+class _StuckScheduler:
+    calls = 0
+
+    async def run(self, call, estimated_tokens, timeout):
+        self.calls += 1
+        raise AdmissionTimeout("queued too long")
+
+
+def test_admission_timeout_not_held_against_provider(monkeypatch):
+    breaker = CircuitBreaker("deepseek", failure_threshold=1, cooldown=60)
+    scheduler = _StuckScheduler()
+    monkeypatch.setattr(openrouter, "get_breaker", lambda provider: breaker)
+    monkeypatch.setattr(openrouter, "get_scheduler", lambda provider: scheduler)
+
+    result = asyncio.run(openrouter._query_model_once(
+        "deepseek:deepseek-chat", [{"role": "user", "content": "hi"}], 10
+    ))
+
+    assert result is None
+    assert scheduler.calls == 1  # not retried
+    assert breaker.state == "closed"
+    assert breaker.consecutive_failures == 0
+    assert not breaker.probe_in_flight
+
+
+def test_scheduler_passes_real_remaining_time():
+    async def run():
+        scheduler = ProviderScheduler("p", max_in_flight=1, rpm=600, tpm=100000)
+        budgets = []
+
+        async def call(remaining):
+            budgets.append(remaining)
+            return {}
+
+        await scheduler.run(call, 0, 0.2)
+        assert 0 < budgets[0] <= 0.2
+
+        with pytest.raises(AdmissionTimeout):
+            await scheduler.run(call, 0, 0)
+        with pytest.raises(AdmissionTimeout):
+            await scheduler.run(call, 0, -1)
+        assert len(budgets) == 1
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_spent_budget_skips_the_attempt(monkeypatch):
+    breaker = CircuitBreaker("deepseek", failure_threshold=1, cooldown=60)
+    scheduler = _StuckScheduler()
+    monkeypatch.setattr(openrouter, "get_breaker", lambda provider: breaker)
+    monkeypatch.setattr(openrouter, "get_scheduler", lambda provider: scheduler)
+
+    result = asyncio.run(openrouter._query_model_once(
+        "deepseek:deepseek-chat", [{"role": "user", "content": "hi"}], 0
+    ))
+
+    assert result is None
+    assert scheduler.calls == 0
+    assert breaker.stats() == CircuitBreaker("deepseek").stats()
@@ -0,0 +1,51 @@
+"""Tests for the two-tier provider response cache."""
+
+import asyncio
+
+from backend.response_cache import ResponseCache, cache_key
+
+
+def test_cache_key_is_canonical():
+    messages = [{"role": "user", "content": "hi"}]
+    assert cache_key("m", messages, {"a": 1, "b": 2}) == cache_key("m", messages, {"b": 2, "a": 1})
+    assert cache_key("m", messages) != cache_key("other", messages)
+
+
+def test_get_returns_a_copy(tmp_path):
+    async def run():
+        cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), ttl=60, memory_entries=10)
+        response = {"content": "answer", "reasoning_details": [{"text": "why"}]}
+        await cache.put("k", "m", response)
+        response["content"] = "changed by the caller"
+
+        first = await cache.get("k")
+        assert first == {"content": "answer", "reasoning_details": [{"text": "why"}]}
+        first["content"] = "mutated"
+        first["reasoning_details"].append({"text": "more"})
+
+        second = await cache.get("k")
+        assert second == {"content": "answer", "reasoning_details": [{"text": "why"}]}
+        assert cache.memory_hits == 2
+        cache.close()
+
+    asyncio.run(run())
+
+
+def test_disk_tier_and_expiry(tmp_path):
+    async def run():
+        path = str(tmp_path / "responses.sqlite3")
+        cache = ResponseCache(path=path, ttl=60, memory_entries=10)
+        await cache.put("k", "m", {"content": "answer"})
+        cache.close()
+
+        reopened = ResponseCache(path=path, ttl=60, memory_entries=10)
+        assert await reopened.get("k") == {"content": "answer"}
+        assert reopened.disk_hits == 1
+        reopened.close()
+
+        expired = ResponseCache(path=path, ttl=-1, memory_entries=10)
+        await expired.put("old", "m", {"content": "stale"})
+        assert await expired.get("old") is None
+        expired.close()
+
+    asyncio.run(run())
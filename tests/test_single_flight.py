@@ -0,0 +1,123 @@
+"""Tests for single-flight coalescing and event draining."""
+
+import asyncio
+
+from backend.main import _drain_events
+from backend.single_flight import SingleFlight
+
+
+async def _collect(flight, queue):
+    return [event async for event in _drain_events(flight.task, queue)]
+
+
+def test_join_coalesces_and_replays_missed_events():
+    async def run():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+        runs = 0
+
+        async def council(on_event):
+            nonlocal runs
+            runs += 1
+            on_event({"type": "stage1_complete"})
+            await gate.wait()
+            on_event({"type": "complete"})
+            return "answer"
+
+        first, first_queue = flights.join("What is 2+2?", council)
+        await asyncio.sleep(0)
+        second, second_queue = flights.join("  What is 2+2? ", council)
+        assert second is first
+        assert flights.stats()["subscribers"] == 2
+
+        gate.set()
+        events = await asyncio.gather(_collect(first, first_queue), _collect(second, second_queue))
+        expected = [{"type": "stage1_complete"}, {"type": "complete"}]
+        assert events == [expected, expected]
+        assert runs == 1
+        assert flights.stats() == {
+            "in_flight": 0, "subscribers": 0, "started": 1, "coalesced": 1, "cancelled": 0,
+        }
+
+    asyncio.run(run())
+
+
+def test_different_questions_do_not_coalesce():
+    async def run():
+        flights = SingleFlight()
+
+        async def council(on_event):
+            return None
+
+        a, _ = flights.join("What is 2+2?", council)
+        b, _ = flights.join("What is 2-2?", council)
+        assert a is not b
+        await asyncio.gather(a.task, b.task)
+
+    asyncio.run(run())
+
+
+def test_run_cancelled_only_when_last_subscriber_leaves():
+    async def run():
+        flights = SingleFlight()
+
+        async def council(on_event):
+            await asyncio.sleep(60)
+
+        flight, first = flights.join("q", council)
+        _, second = flights.join("q", council)
+
+        flights.leave(flight, first)
+        await asyncio.sleep(0)
+        assert not flight.task.done()
+
+        flights.leave(flight, second)
+        await asyncio.sleep(0)
+        assert flight.task.cancelled()
+        assert flights.stats()["in_flight"] == 0
+        assert flights.cancelled == 1
+
+        # A new request after cancellation starts a fresh run
+        again, queue = flights.join("q", council)
+        assert again is not flight
+        flights.leave(again, queue)
+
+    asyncio.run(run())
+
+
+def test_leave_after_finish_keeps_result():
+    async def run():
+        flights = SingleFlight()
+
+        async def council(on_event):
+            return "answer"
+
+        flight, queue = flights.join("q", council)
+        assert await flight.task == "answer"
+        flights.leave(flight, queue)
+        assert flights.cancelled == 0
+
+    asyncio.run(run())
+
+
+def test_disconnect_does_not_leak_a_queue_reader():
+    async def run():
+        task = asyncio.create_task(asyncio.sleep(60))
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def client():
+            async for _ in _drain_events(task, events):
+                pass
+
+        reader = asyncio.create_task(client())
+        await asyncio.sleep(0)
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+
+        # A leaked events.get() would swallow this event
+        events.put_nowait({"type": "late"})
+        await asyncio.sleep(0)
+        assert events.qsize() == 1
+        task.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,112 @@
+"""Tests for the append-only JSONL conversation storage."""
+
+import json
+import os
+
+from backend import storage
+
+
+def _records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def _forget_indexes(monkeypatch):
+    # As if another process (or a restart) had to rebuild everything from the logs
+    monkeypatch.setattr(storage, "_indexes", storage._IndexCache())
+    storage.conversation_cache.clear()
+
+
+def test_replay_from_log(data_dir, monkeypatch):
+    conversation = storage.create_conversation("c1")
+    storage.add_user_message("c1", "hello")
+    storage.add_assistant_message("c1", [{"model": "m", "response": "r"}], [], {"response": "hi"})
+    storage.update_conversation_title("c1", "Greeting")
+
+    _forget_indexes(monkeypatch)
+    loaded = storage.get_conversation("c1")
+    assert loaded["created_at"] == conversation["created_at"]
+    assert loaded["title"] == "Greeting"
+    assert [m["role"] for m in loaded["messages"]] == ["user", "assistant"]
+    assert loaded["messages"][1]["stage3"] == {"response": "hi"}
+    assert storage.get_messages("c1", 1, 1) == loaded["messages"][1:]
+    assert storage.list_conversations()[0]["message_count"] == 2
+
+
+def test_torn_tail_is_truncated(data_dir, monkeypatch):
+    storage.create_conversation("c1")
+    storage.add_user_message("c1", "kept")
+    path = storage.get_conversation_path("c1")
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"type": "message", "message": {"role": "user", "cont')
+
+    _forget_indexes(monkeypatch)
+    assert [m["content"] for m in storage.get_conversation("c1")["messages"]] == ["kept"]
+    assert os.path.getsize(path) == intact
+
+    storage.add_user_message("c1", "after crash")
+    _forget_indexes(monkeypatch)
+    assert [m["content"] for m in storage.get_conversation("c1")["messages"]] == ["kept", "after crash"]
+
+
+def test_compaction_drops_superseded_titles(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, "CONVERSATION_COMPACT_THRESHOLD", 3)
+    storage.create_conversation("c1")
+    storage.add_user_message("c1", "question")
+    for n in range(3):
+        storage.update_conversation_title("c1", f"title {n}")
+
+    records = _records(storage.get_conversation_path("c1"))
+    assert [r["type"] for r in records] == ["conversation", "message"]
+    assert records[0]["title"] == "title 2"
+    loaded = storage.get_conversation("c1")
+    assert loaded["title"] == "title 2"
+    assert [m["content"] for m in loaded["messages"]] == ["question"]
+
+
+def test_fork_shares_history_and_detaches_on_delete(data_dir, monkeypatch):
+    storage.create_conversation("parent")
+    storage.add_user_message("parent", "one")
+    storage.add_user_message("parent", "two")
+
+    fork = storage.fork_conversation("parent", "child", title="Fork")
+    assert fork["message_count"] == 2
+    assert [r["type"] for r in _records(storage.get_conversation_path("child"))] == ["conversation"]
+
+    storage.add_user_message("child", "child only")
+    storage.add_user_message("parent", "parent only")
+    assert [m["content"] for m in storage.get_conversation("child")["messages"]] == ["one", "two", "child only"]
+    assert storage.get_messages("child", 1, 2) == [
+        {"role": "user", "content": "two"}, {"role": "user", "content": "child only"},
+    ]
+
+    storage.delete_conversation("parent")
+    assert storage.get_conversation("parent") is None
+    header = _records(storage.get_conversation_path("child"))[0]
+    assert "parent" not in header
+
+    _forget_indexes(monkeypatch)
+    child = storage.get_conversation("child")
+    assert child["title"] == "Fork"
+    assert [m["content"] for m in child["messages"]] == ["one", "two", "child only"]
+    assert [c["id"] for c in storage.list_conversations()] == ["child"]
+
+
+def test_delete_leaves_lock_file(data_dir):
+    storage.create_conversation("c1")
+    storage.delete_conversation("c1")
+    assert not os.path.exists(storage.get_conversation_path("c1"))
+    assert os.path.exists(os.path.join(str(data_dir), "c1" + storage.LOCK_SUFFIX))
+
+
+def test_index_cache_is_bounded(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, "_indexes", storage._IndexCache(max_entries=2))
+    for n in range(4):
+        storage.create_conversation(f"c{n}")
+        storage.add_user_message(f"c{n}", f"message {n}")
+    assert len(storage._indexes) == 2
+
+    # Evicted indexes are rebuilt from the log on demand
+    assert storage.get_messages("c0") == [{"role": "user", "content": "message 0"}]
+    assert len(storage._indexes) == 2